@@ -6,8 +6,13 @@ initialize a Note objcet by:
 my_note = Note("A4")
 """
 import numpy as np
-import sounddevice as sd
 import types
+import math
+import os
+import collections
+import queue
+import threading
+import struct
 
 
 class Note:
@@ -18,6 +23,415 @@ class Note:
             elif isinstance(index, int):
                 return super().__getitem__(index % len(self))
 
+    class WaveCache:
+        #an LRU cache of rendered waves, bounded by the number of bytes it holds.
+        #it is off by default, turn it on by Note.cache = Note.WaveCache(max_bytes = 256*2**20)
+        #while it is on, wave() methods return read-only arrays.
+        def __init__(self, max_bytes = 64*2**20):
+            self.max_bytes = max_bytes
+            self.bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.waves = collections.OrderedDict()
+
+        def get(self, key):
+            #returns a read-only view of the cached wave, None if it is not cached
+            wave = self.waves.get(key)
+            if wave is None:
+                self.misses += 1
+                return None
+            self.waves.move_to_end(key)
+            self.hits += 1
+            return wave.view()
+
+        def put(self, key, wave):
+            #stores the wave (which must not be changed afterwards) and returns a read-only view of it
+            if wave.nbytes > self.max_bytes:
+                return wave
+            wave.flags.writeable = False
+            if key in self.waves:
+                self.bytes -= self.waves.pop(key).nbytes
+            self.waves[key] = wave
+            self.bytes += wave.nbytes
+            while self.bytes > self.max_bytes:
+                self.bytes -= self.waves.popitem(last=False)[1].nbytes
+            return wave.view()
+
+        def clear(self):
+            self.waves.clear()
+            self.bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+        def stats(self):
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self.waves), "bytes": self.bytes}
+
+    cache = None #a Note.WaveCache, used by the wave() methods when it is set
+
+    #audio backends: play() needs an object with the parts of the sounddevice module it uses,
+    #play(wave, samplerate), wait(), OutputStream(samplerate, blocksize, channels, callback, finished_callback) and CallbackStop.
+    #the callbacks given to OutputStream raise CallbackStop(frames) with the number of samples of their last block that are sound,
+    #the rest of that block is zero (sounddevice plays all of it, NullAudio streams keep only the sound).
+    #check_output_settings(samplerate, channels) is used, if the backend has it, to see if a sample rate can be played.
+    #the callbacks play silence when the next block is not rendered yet, instead of blocking the audio thread,
+    #unless the backend has realtime = False (its streams are not played in real time, so they wait for the blocks).
+    audio = None #the backend of play(), the sounddevice module if None (imported on the first play)
+
+    @staticmethod
+    def backend(audio = None):
+        #returns audio if it is given, else Note.audio, importing sounddevice the first time it is needed
+        if audio is not None:
+            return audio
+        if Note.audio is None:
+            import sounddevice
+            Note.audio = sounddevice
+        return Note.audio
+
+    @staticmethod
+    def plays_at(audio, sample_rate):
+        #True if the backend can play the sample rate (always, for backends without check_output_settings)
+        check = getattr(audio, "check_output_settings", None)
+        if check is None:
+            return True
+        try:
+            check(samplerate=sample_rate, channels=1)
+        except Exception:
+            return False
+        return True
+
+    class NullAudio:
+        #an audio backend that plays nothing. its streams pull every block as soon as they are started.
+        realtime = False
+        class CallbackStop(Exception):
+            pass
+
+        class Stream:
+            def __init__(self, audio, samplerate, blocksize, channels, callback, finished_callback=None):
+                self.audio = audio
+                self.samplerate = samplerate
+                self.blocksize = blocksize
+                self.channels = channels
+                self.callback = callback
+                self.finished_callback = finished_callback
+
+            def __enter__(self):
+                self.start()
+                return self
+
+            def __exit__(self, *args):
+                self.close()
+
+            def start(self):
+                while True:
+                    outdata = np.zeros((self.blocksize, self.channels), dtype=np.float32)
+                    try:
+                        self.callback(outdata, self.blocksize, None, None)
+                    except self.audio.CallbackStop as stop:
+                        frames = stop.args[0] if stop.args else self.blocksize
+                        self.audio.write(outdata[:frames, 0], self.samplerate)
+                        break
+                    self.audio.write(outdata[:, 0], self.samplerate)
+                self.audio.flush()
+                if self.finished_callback is not None:
+                    self.finished_callback()
+
+            def close(self):
+                pass
+
+        def OutputStream(self, samplerate, blocksize, channels, callback, finished_callback=None):
+            return Note.NullAudio.Stream(self, samplerate, blocksize, channels, callback, finished_callback)
+
+        def play(self, wave, samplerate):
+            self.write(np.asarray(wave), samplerate)
+
+        def wait(self):
+            self.flush()
+
+        def write(self, samples, samplerate):
+            pass
+
+        def flush(self):
+            #called when a play or a stream is done
+            pass
+
+    class FakeAudio(NullAudio):
+        #stands in for the sounddevice module where there is no audio device (e.g. in tests).
+        #keeps everything it is given in .written
+        def __init__(self):
+            self.written = []
+
+        def write(self, samples, samplerate):
+            self.written.append(samples.copy())
+
+        def samples(self):
+            #everything that was played, as one array
+            return np.concatenate([np.zeros(0)]+self.written)
+
+    class FileAudio(NullAudio):
+        #an audio backend that writes everything played through it into one wav file.
+        def __init__(self, path, sample_format = "int16"):
+            if sample_format not in Note.sample_formats:
+                raise Exception("'sample_format' parameter must be one of the following: 'int16', 'int24', 'float32'")
+            self.path = path
+            self.sample_format = sample_format
+            self.total = 0
+            self.samplerate = None
+            self.file = None #open from the first write until close()
+
+        def write(self, samples, samplerate):
+            if self.samplerate is None:
+                self.samplerate = samplerate
+                self.file = open(self.path, "wb")
+                self.file.write(Note.wav_header(0, samplerate, self.sample_format))
+            elif samplerate != self.samplerate:
+                raise Exception("Everything written to a file must have the same sample rate.")
+            elif self.file is None:
+                self.file = open(self.path, "r+b")
+            #the samples go over the pad byte of the previous flush, if there is one
+            self.file.seek(44 + self.total*Note.sample_formats[self.sample_format][0])
+            self.file.write(Note.pcm(samples, self.sample_format))
+            self.total += samples.size
+
+        def flush(self):
+            #the header is written with the number of samples when a play or a stream is done
+            if self.file is not None:
+                size = self.total*Note.sample_formats[self.sample_format][0]
+                self.file.seek(0)
+                self.file.write(Note.wav_header(self.total, self.samplerate, self.sample_format))
+                self.file.seek(44 + size)
+                self.file.write(b"\x00"*(size % 2))
+                self.file.truncate()
+                self.file.flush()
+
+        def close(self):
+            #the file is complete after every play, close() releases it (the next play opens it again)
+            self.flush()
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    @staticmethod
+    def stream(blocks, sample_rate = 44100, block_size = 1024, prefetch = 4, audio = None):
+        #plays an iterable of sample blocks through an output stream whose callback takes them one at a time.
+        #a thread renders the blocks, at most prefetch blocks ahead of the callback,
+        #so the first sound comes after one block and the memory used does not depend on the length of the piece.
+        #audio is the backend to play through (see Note.backend).
+        #an exception raised while rendering stops the stream and is raised again here.
+        audio = Note.backend(audio)
+        realtime = getattr(audio, "realtime", True)
+        ready = queue.Queue(maxsize=prefetch)
+        current = [np.zeros(0), 0] #the block the callback is taking samples from, and its position
+        errors = []
+        def produce():
+            try:
+                for block in blocks:
+                    ready.put(block)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                ready.put(None)
+        def callback(outdata, frames, time, status):
+            #fills outdata from as many blocks as it takes, so blocks of any size play without gaps
+            filled = 0
+            while filled < frames:
+                block, position = current
+                if position == block.size:
+                    try:
+                        block = ready.get_nowait() if realtime else ready.get()
+                    except queue.Empty:
+                        outdata[filled:] = 0 #the next block is late, silence until it comes
+                        return
+                    if block is None:
+                        outdata[filled:] = 0
+                        raise audio.CallbackStop(filled)
+                    current[:] = [block, 0]
+                    continue
+                count = min(frames - filled, block.size - position)
+                outdata[filled:filled+count, 0] = block[position:position+count]
+                filled += count
+                current[1] = position + count
+        finished = threading.Event()
+        threading.Thread(target=produce, daemon=True).start()
+        with audio.OutputStream(samplerate=sample_rate, blocksize=block_size, channels=1, callback=callback,
+                                finished_callback=finished.set):
+            finished.wait()
+        if errors:
+            raise errors[0]
+
+    class PlayQueue:
+        #plays waves one after another through one output stream, without blocking the caller.
+        #put() takes an iterable of sample blocks and returns a handle at once. a thread renders the blocks of the queued
+        #items in order, at most prefetch blocks ahead of the stream, so the next item is rendered while the current one plays.
+        #the stream callback takes the samples from the blocks as they come, so an item starts on the sample after the
+        #previous one ends. the stream stops when there is nothing left to play and starts again on the next put().
+        # initialize by my_queue = Note.PlayQueue(audio = Note.FakeAudio()), or let play_async() use Note.player
+        class Handle:
+            #an item of a play queue. it can be cancelled, waited for, or awaited in a coroutine (await my_handle)
+            def __init__(self):
+                self.cancelled = False
+                self.error = None #the exception raised while rendering the item, raised again by wait() and await
+                self.finished = threading.Event()
+                self.lock = threading.Lock()
+                self.callbacks = []
+
+            def cancel(self):
+                #the item is not played, or stops where it is if it is playing. the next items are played as usual
+                self.cancelled = True
+
+            def stop(self):
+                #same as cancel()
+                self.cancel()
+
+            def done(self):
+                #True when the last sample of the item has been given to the audio backend, or the item was cancelled
+                return self.finished.is_set()
+
+            def wait(self, timeout = None):
+                if not self.finished.wait(timeout):
+                    return False
+                if self.error is not None:
+                    raise self.error
+                return True
+
+            def add_callback(self, callback):
+                #calls callback() when the item is done (from the thread of the audio backend)
+                with self.lock:
+                    if not self.finished.is_set():
+                        self.callbacks.append(callback)
+                        return
+                callback()
+
+            def finish(self):
+                with self.lock:
+                    self.finished.set()
+                    callbacks, self.callbacks = self.callbacks, []
+                for callback in callbacks:
+                    callback()
+
+            def __await__(self):
+                import asyncio #only needed here, so it is not imported with the module
+                loop = asyncio.get_running_loop()
+                future = loop.create_future()
+                def settle():
+                    if not future.done():
+                        if self.error is not None:
+                            future.set_exception(self.error)
+                        else:
+                            future.set_result(None)
+                def done():
+                    loop.call_soon_threadsafe(settle)
+                self.add_callback(done)
+                return future.__await__()
+
+        def __init__(self, sample_rate = 44100, block_size = 1024, prefetch = 4, audio = None):
+            self.sample_rate = sample_rate
+            self.block_size = block_size
+            self.audio = Note.backend(audio)
+            self.items = queue.Queue() #(handle, blocks) of the items waiting to be rendered
+            self.ready = queue.Queue(maxsize=prefetch) #(handle, block) rendered blocks, (handle, None) after the last one of an item
+            self.lock = threading.Lock()
+            self.pending = 0 #items that are queued and not done
+            self.handles = []
+            self.running = False #True while the output stream is running
+            self.block = None #the block the stream callback is taking samples from, and its handle and position
+            self.handle = None
+            self.position = 0
+            self.ended = [] #handles whose last samples went into the last block given to the backend
+            threading.Thread(target=self.render, daemon=True).start()
+
+        @staticmethod
+        def default(sample_rate = 44100, audio = None):
+            #Note.player, replaced by a new queue if it plays at another sample rate or through another backend
+            if (Note.player is None or Note.player.sample_rate != sample_rate or
+                    (audio is not None and Note.player.audio is not audio)):
+                Note.player = Note.PlayQueue(sample_rate = sample_rate, audio = audio)
+            return Note.player
+
+        def put(self, blocks):
+            #queues an iterable of sample blocks, returns its handle
+            handle = Note.PlayQueue.Handle()
+            with self.lock:
+                self.pending += 1
+                self.handles = [i for i in self.handles if not i.done()] + [handle]
+                start = not self.running
+                self.running = True
+            self.items.put((handle, blocks))
+            if start:
+                threading.Thread(target=self.run, daemon=True).start()
+            return handle
+
+        def stop(self):
+            #cancels every queued item
+            with self.lock:
+                handles = list(self.handles)
+            for handle in handles:
+                handle.cancel()
+
+        def wait(self, timeout = None):
+            #waits until every queued item is done (the errors of the items are raised by their handles)
+            with self.lock:
+                handles = list(self.handles)
+            for handle in handles:
+                handle.finished.wait(timeout)
+
+        def render(self):
+            while True:
+                handle, blocks = self.items.get()
+                try:
+                    for block in blocks:
+                        if handle.cancelled:
+                            break
+                        self.ready.put((handle, block))
+                except Exception as error:
+                    #the item stops here and the next ones are played as usual
+                    handle.error = error
+                finally:
+                    self.ready.put((handle, None))
+
+        def run(self):
+            finished = threading.Event()
+            with self.audio.OutputStream(samplerate=self.sample_rate, blocksize=self.block_size, channels=1,
+                                         callback=self.callback, finished_callback=finished.set):
+                finished.wait()
+            self.finish()
+
+        def finish(self):
+            #the items that ended in the last block are done once the backend has taken that block
+            with self.lock:
+                ended, self.ended = self.ended, []
+            for handle in ended:
+                handle.finish()
+
+        def callback(self, outdata, frames, time, status):
+            self.finish()
+            filled = 0
+            while filled < frames:
+                if self.block is None or self.position == self.block.size or self.handle.cancelled:
+                    with self.lock:
+                        if self.pending == 0:
+                            self.running = False
+                            self.block = None
+                            outdata[filled:] = 0
+                            raise self.audio.CallbackStop(filled)
+                    try:
+                        item = self.ready.get_nowait() if getattr(self.audio, "realtime", True) else self.ready.get()
+                    except queue.Empty:
+                        outdata[filled:] = 0 #the next block is late, silence until it comes
+                        return
+                    self.handle, self.block = item
+                    self.position = 0
+                    if self.block is None:
+                        with self.lock:
+                            self.pending -= 1
+                            self.ended.append(self.handle)
+                    continue
+                count = min(frames - filled, self.block.size - self.position)
+                outdata[filled:filled+count, 0] = self.block[self.position:self.position+count]
+                filled += count
+                self.position += count
+
+    player = None #the queue of play_async(), a Note.PlayQueue made by the first call
+
     sets = CircularList(("C","C#","D","Eb","E","F","F#","G","Ab","A","Bb","B"))
     fifths = CircularList(("C","G","D","A","E","B","F#","C#","Ab","Eb","Bb","F"))
     scales = {"major":(0,2,4,5,7,9,11,12),
@@ -39,64 +453,100 @@ class Note:
     @staticmethod
     def bykey(key,duration=1,dynamic=0.25,timbre=[1]):
         #creates a note object by MIDI number
-        octave = key//12 -1
-        index = key % 12
-        name_set = Note.sets[index]
-        name = name_set+str(octave)
-        return Note(name,duration=duration,dynamic=dynamic,timbre=timbre)
+        #the name is taken from the key, so there is nothing to parse
+        note = Note.__new__(Note)
+        if 0 <= key < len(Note.names):
+            name = Note.names[key]
+            note._index = Note.classes[key]
+        else:
+            name = Note.sets[key % 12]+str(key//12 -1)
+            note._index = key % 12
+        note.name = name
+        note.name1 = name
+        note.duration = duration
+        note.dynamic = dynamic
+        note.timbre = timbre
+        note._key = key
+        return note
 
     @staticmethod
     def byfreq(frequency,duration=1,dynamic=0.25,timbre=[1]):
         #created a Note object by a frequency
-        key = 69+12*np.log(frequency/440)/np.log(2)
+        if not frequency > 0 or math.isinf(frequency):
+            raise Exception("'frequency' parameter must be a positive number.")
+        key = 69+12*math.log2(frequency/440)
         return Note.bykey(round(key),duration=duration,dynamic=dynamic,timbre=timbre)
 
+    @staticmethod
+    def keys_byfreq(frequencies):
+        #the MIDI numbers of the closest notes to an array of frequencies, in one call (as byfreq rounds them)
+        frequencies = np.asarray(frequencies, dtype=np.float64)
+        if not (np.isfinite(frequencies) & (frequencies > 0)).all():
+            raise Exception("'frequencies' parameter must have positive numbers only.")
+        return np.rint(69+12*np.log2(frequencies/440)).astype(np.int64)
+
+    __slots__ = ("name","name1","duration","dynamic","timbre","_key","_index")
+    parsed = {} #note name -> (name1, note index, MIDI number), filled by Note.parse
+
+    @staticmethod
+    def parse(name):
+        #parses a note name once and caches the result ( "Db4" -> ("C#4", 1, 61) )
+        try:
+            return Note.parsed[name]
+        except KeyError:
+            pass
+        name1 = name
+        if "Db" in name:
+            name1 = name1.replace("Db","C#")
+        if "D#" in name:
+            name1 = name1.replace("D#","Eb")
+        if "Gb" in name:
+            name1 = name1.replace("Gb","F#")
+        if "G#" in name:
+            name1 = name1.replace("G#", "Ab")
+        if "A#" in name:
+            name1 = name1.replace("A#","Bb")
+        set = ""
+        for i in name1:
+            if i.isalpha() or i == "#" or i == "b":
+                set = set + i
+        octave = name1.replace(set,"").replace("#","").replace("b","")
+        try:
+            index = Note.sets.index(set)
+            key = index + 12*(int(octave)+1)
+        except ValueError:
+            raise Exception("'name' parameter is invalid, must be a note name. (e.g.: C5, Ab4)")
+        Note.parsed[name] = (name1, index, key)
+        return Note.parsed[name]
+
     def __init__(self,name,duration=1,dynamic=0.25,timbre=[1]):
         #timbre is the relative amplitudes of the harmonics. default timbre [1] representts a sinusoidal.
         self.name = name
         self.duration = duration
         self.dynamic = dynamic
         self.timbre = timbre
-        self.name1 = self.name
-        if "Db" in self.name:
-            self.name1 = self.name1.replace("Db","C#")
-        if "D#" in self.name:
-            self.name1 = self.name1.replace("D#","Eb")
-        if "Gb" in self.name:
-            self.name1 = self.name1.replace("Gb","F#")
-        if "G#" in self.name:
-            self.name1 = self.name1.replace("G#", "Ab")
-        if "A#" in self.name:
-            self.name1 = self.name1.replace("A#","Bb")
+        self.name1, self._index, self._key = Note.parse(name)
 
     def set(self):
         #returns the name of the note without octave indicator (  A4 = Note("A4), A4.set() = "A" )
-        set = ""
-        for i in self.name1:
-            if i.isalpha() or i == "#" or i == "b":
-                set = set + i
-        return set
+        return Note.sets[self._index]
 
     def octave(self):
-        octave = self.name1.replace(self.set(),"")
-        if "#" in octave:
-            octave = octave.replace("#","")
-        if "b" in octave:
-            octave = octave.replace("b","")
-        return int(octave)
+        return self._key//12 - 1
 
     def note_index(self):
         #returns the index of the note set in the Note.sets list
-        return Note.sets.index(self.set())
+        return self._index
 
     def key(self):
         #returns the MIDI number of the note
-        key = self.note_index() + 12*(int(self.octave())+1)
-        return key
+        return self._key
 
     def frequency(self):
         #obviously...
-        return 440*2**((self.key()-69)/12)
+        if 0 <= self._key < 128:
+            return Note.frequencies[self._key]
+        return 440*2**((self._key-69)/12)
 
     def add1(self,semitone=1):
         if type(semitone) != int:
@@ -110,7 +560,7 @@ class Note:
         if type(other) == Note:
             return Note.array([self,other])
         if type(other) == Note.array:
-            return Note.array([self]+other.list)
+            return Note.array.join([Note.array([self]), other])
 
     def __radd__(self,other):
         if type(other) == int:
@@ -174,14 +624,30 @@ class Note:
 
     def harmonic(self,n):
         #returns harmonics of the note (as a note)
+        if type(n) == int and 0 < n < len(Note.harmonic_table):
+            return self.add1(Note.harmonic_table[n])
         key_difference = 12*np.log(n)/np.log(2)
         return self.add1(round(key_difference))
 
     def subharmonic(self,n):
         if type(n) != int:
             raise Exception("'n' parameter must be integer.")
+        if 0 < n < len(Note.subharmonic_table):
+            return self.add1(Note.subharmonic_table[n])
         return self.harmonic(1/n)
 
+    harmonic_bound = 1024 #the harmonics and subharmonics up to it are computed once, when the module is loaded
+    harmonic_table = [0] #the semitones from a note to its n-th harmonic at index n
+    subharmonic_table = [0] #the semitones from a note to its n-th subharmonic at index n, grown by subharmonic_offsets
+
+    @staticmethod
+    def subharmonic_offsets(count):
+        #returns the semitones from a note to its subharmonics 1...count, as subharmonic() computes them
+        table = Note.subharmonic_table
+        for n in range(len(table), count+1):
+            table.append(round(12*np.log(1/n)/np.log(2)))
+        return np.array(table[1:count+1], dtype=np.int64)
+
     def chord(self,degree=0,root=0,intervals = (0,4,7)):
         if root != 0:
             if "Db" in root:
@@ -196,10 +662,11 @@ class Note:
                 root = root.replace("A#", "Bb")
         if type(degree) != int:
             raise Exception("'degree' parameter must be integer.")
-        try:
-            temp = Note("root")
-        except:
-            raise Exception("'root' parameter is invalid, must be a note name. (e.g.: C5, Ab4)")
+        if root != 0:
+            try:
+                Note.parse(root+"0")
+            except:
+                raise Exception("'root' parameter is invalid, must be a note name. (e.g.: C5, Ab4)")
         if type(intervals) != tuple:
             raise Exception("'intervals' parameter must be a tuple.")
         if len(intervals) < 3:
@@ -215,33 +682,47 @@ class Note:
         if degree == 0:
             return self
         if root == 0:
-            if degree > 0:
-                notes = [self+i for i in intervals]
-                notes_add = [self+i for i in intervals]
-                for i in range(1,int(degree)):
-                    for j in notes_add:
-                        notes.append(j+i*12)
-                return notes[degree]
-            if degree < 0:
-                notes = [self]+[self+(i-12) for i in reversed(intervals)]
-                notes_add = [self]+[self+(i-12) for i in reversed(intervals)]
-                for i in range(1, int(-degree)):
-                    for j in notes_add:
-                        notes.append(j - i * 12)
-                return notes[-degree]
+            return self.add1(Note.degree_semitones(degree, intervals))
         else:
-            difference = ((self+120)-Note(root+"0") )%12
-            root_note= self-difference
-            is_there = 0
-            for i in range(12):
-                if root_note.chord(i,intervals = intervals).name == self.name1:
-                    is_there += 1
-                    difference = i
-                    break
-            if is_there == 0:
+            difference = (self._key - Note.parse(root+"0")[1]) % 12
+            steps = Note.degrees(intervals)[2]
+            if difference not in steps:
                 raise Exception("Note object is not in root note's chord.")
-                return
-            return root_note.chord(degree =degree+difference,intervals = intervals)
+            return self.add1(-difference).chord(degree = degree+steps[difference], intervals = intervals)
+
+    degree_tables = {}
+
+    @staticmethod
+    def degrees(intervals):
+        #returns the tables chord() uses for the intervals (built once for every intervals tuple):
+        #the semitones of the steps above the root (one octave of them), the semitones of the steps below it,
+        #and the first step (out of the first 12) that lands on every semitone.
+        if intervals not in Note.degree_tables:
+            up = tuple(intervals)
+            down = (0,) + tuple(i - 12 for i in reversed(intervals))
+            steps = {}
+            for i in range(12):
+                semitone = 0 if i == 0 else up[i % len(up)] + 12*(i // len(up))
+                if semitone not in steps:
+                    steps[semitone] = i
+            Note.degree_tables[intervals] = (up, down, steps)
+        return Note.degree_tables[intervals]
+
+    @staticmethod
+    def degree_semitones(degree, intervals):
+        #the semitones between a note and its chord(degree, intervals = intervals), in closed form:
+        #every octave of steps above the note repeats the intervals, every octave below repeats the note and the reversed intervals.
+        #degree can also be a numpy array of degrees.
+        up, down = Note.degrees(intervals)[:2]
+        if isinstance(degree, np.ndarray):
+            up, down = np.array(up), np.array(down)
+            return np.where(degree > 0, up[degree % len(up)] + 12*(degree // len(up)),
+                            np.where(degree < 0, down[-degree % len(down)] - 12*(-degree // len(down)), 0))
+        if degree > 0:
+            return up[degree % len(up)] + 12*(degree // len(up))
+        if degree < 0:
+            return down[-degree % len(down)] - 12*(-degree // len(down))
+        return 0
 
     def Maj(self, degree=0, root=0): #major chord
         return self.chord(degree, root, Note.chords["Maj"])
@@ -293,46 +774,116 @@ class Note:
             for i in list(Note.scales.keys()):
                 string += ", "+i
             raise Exception("'scale' parameter must be one of the following:",string)
-        mainnote_octave = self.octave()
-        mainset = self.name1.replace( str(mainnote_octave), "")
         if tone is None:
-            tone = mainset
             root = 0
         else:
             root = tone
+        return self.chord(degree = add, root = root, intervals = Note.scale_intervals(scale))
+
+    @staticmethod
+    def scale_intervals(scale):
+        #returns the intervals add() uses for a scale
         if scale == "major" or scale == "ionian":
-            return self.chord(degree = add,root = root, intervals = Note.scales["major"])
+            return Note.scales["major"]
         elif scale == "natural minor" or scale == "aeolian":
-            return self.chord(degree = add,root = root, intervals = (0,2,3,5,6,8,10,12))
+            return (0,2,3,5,6,8,10,12)
         elif scale == "harmonic minor":
-            return self.chord(degree=add, root=root, intervals=Note.scales["harmonic minor"])
+            return Note.scales["harmonic minor"]
         elif scale == "melodic minor":
-            return self.chord(degree=add, root=root, intervals=Note.scales["melodic minor"])
+            return Note.scales["melodic minor"]
         elif scale == "dorian":
-            return self.chord(degree=add, root=root, intervals=(0, 2, 3, 5, 6, 9, 10, 12))
+            return (0, 2, 3, 5, 6, 9, 10, 12)
         elif scale == "phyrigian":
-            return self.chord(degree=add, root=root, intervals=(0, 1, 3, 5, 7, 8, 10, 12))
+            return (0, 1, 3, 5, 7, 8, 10, 12)
         elif scale == "lydian":
-            return self.chord(degree=add, root=root, intervals=(0,2,4,6,7,9,11,12))
+            return (0,2,4,6,7,9,11,12)
         elif scale == "mixolydian":
-            return self.chord(degree=add, root=root, intervals=(0,2,4,5,7,9,10,12))
+            return (0,2,4,5,7,9,10,12)
         elif scale == "locrian":
-            return self.chord(degree=add, root=root, intervals=(0,1,3,5,6,8,10,12))
+            return (0,1,3,5,6,8,10,12)
         else:
-            return self.chord(degree=add, root=root, intervals=scale)
+            return scale
 
 
 
     def display(self):
         print("Name:",self.name1,",Duration:",self.duration,",MIDI number:",self.key(),",Note set:",self.set())
 
-    def wave(self, tempo = 120, sample_rate = 44100, fadein = 0.05, fadeout = 0.05, damp = 0):
-        time = np.arange(0, (self.duration * 60 / tempo), 1 / sample_rate)
-        audio = np.array(time.size * [0], dtype=np.int16)
-        for i in range(len(self.timbre)):
-            audio = audio + self.timbre[i] * np.sin((i + 1) * self.frequency() * 2 * np.pi * time)
+    def samples(self, tempo = 120, sample_rate = 44100):
+        #returns the number of samples the note lasts when rendered
+        return max(int(np.ceil(self.duration * 60 / tempo / (1 / sample_rate))), 0)
 
-        audio = self.dynamic * audio *np.exp(-time*damp)
+    @staticmethod
+    def synthesize(frequency, timbre, time, sample_rate = 44100, out = None, dtype = np.float64):
+        #adds up the harmonics of a timbre over a time vector.
+        #only the fundamental is computed with np.sin, the other harmonics come from the recurrence
+        #sin((n+1)x) = 2cos(x)sin(nx) - sin((n-1)x), block by block so that the buffers stay small.
+        #harmonics with zero amplitude or above the nyquist frequency are skipped.
+        #time can also be a number of samples, the times of the samples (n/sample_rate) are then computed block by block.
+        #the blocks are computed in float64 and added into an output of dtype.
+        size = time if isinstance(time, (int, np.integer)) else time.size
+        if out is None:
+            out = np.empty(size, dtype=dtype)
+        out = out[:size]
+        out[:] = 0
+        amplitudes = [float(timbre[i]) for i in range(len(timbre)) if (i+1) * frequency < sample_rate / 2]
+        while amplitudes and amplitudes[-1] == 0:
+            amplitudes.pop()
+        if not amplitudes:
+            return out
+        block = 8192
+        for start in range(0, size, block):
+            audio = out[start:start+block]
+            if isinstance(time, (int, np.integer)):
+                phase = np.arange(start, start+audio.size) * (1 / sample_rate)
+                phase *= frequency * 2 * np.pi
+            else:
+                phase = time[start:start+block] * (frequency * 2 * np.pi)
+            current = np.sin(phase)
+            if amplitudes[0] != 0:
+                np.multiply(current, amplitudes[0], out=audio)
+            if len(amplitudes) == 1:
+                continue
+            double_cos = np.cos(phase, out=phase)
+            double_cos *= 2
+            previous = np.zeros(current.size)
+            following = np.empty(current.size)
+            for amplitude in amplitudes[1:]:
+                np.multiply(double_cos, current, out=following)
+                following -= previous
+                previous, current, following = current, following, previous
+                if amplitude != 0:
+                    np.multiply(current, amplitude, out=following)
+                    audio += following
+        return out
+
+    def wave(self, tempo = 120, sample_rate = 44100, fadein = 0.05, fadeout = 0.05, damp = 0, out = None, dtype = np.float64):
+        #if out is given, the samples are written into it and it is returned.
+        #dtype is the type of the samples (np.float32 halves the memory), the gain, damping and fades are applied
+        #in place on the samples, without a time vector.
+        size = self.samples(tempo, sample_rate)
+        if out is not None:
+            if out.size < size:
+                raise Exception("'out' parameter must have at least "+str(size)+" samples.")
+            out = out[:size]
+        if Note.cache is not None:
+            cache_key = ("note", self._key, self.duration, self.dynamic, tuple(self.timbre),
+                         tempo, sample_rate, fadein, fadeout, damp, np.dtype(dtype).str)
+            cached = Note.cache.get(cache_key)
+            if cached is not None:
+                if out is None:
+                    return cached
+                out[:] = cached
+                return out
+        audio = Note.synthesize(self.frequency(), self.timbre, size, sample_rate = sample_rate, out = out, dtype = dtype)
+        audio *= self.dynamic
+        if damp != 0:
+            #the damping envelope is computed block by block from the times of the samples
+            for start in range(0, size, 8192):
+                envelope = np.arange(start, min(start+8192, size)) * (1 / sample_rate)
+                np.multiply(envelope, -damp, out=envelope)
+                np.exp(envelope, out=envelope)
+                audio[start:start+8192] *= envelope
         def fade_out(n):
             t = np.linspace(0, np.pi, n)
             return 0.5*(1 + np.cos(t))
@@ -340,62 +891,324 @@ class Note:
             t = np.linspace(np.pi, 2 * np.pi, n)
             return 0.5*(1 + np.cos(t))
 
-        fadein_length = int(fadein*time.size)
-        fadeout_length = int(fadeout*time.size)
+        fadein_length = int(fadein*size)
+        fadeout_length = int(fadeout*size)
+
+        audio[:fadein_length] *= fade_in(fadein_length)
+        audio[audio.size-fadeout_length:] *= fade_out(fadeout_length)
+        if Note.cache is not None:
+            if out is None:
+                return Note.cache.put(cache_key, audio)
+            Note.cache.put(cache_key, audio.copy())
+        return audio
+
+    def play(self,tempo = 120, sample_rate=44100, fadein = 0.05, fadeout = 0.05, damp = 0, stream = False, block_size = 1024, audio = None):
+        #stream = True plays the note block by block (see Note.stream)
+        if stream:
+            return Note.array([self]).play(tempo, sample_rate = sample_rate, fadein = fadein, fadeout = fadeout, damp = damp,
+                                           stream = True, block_size = block_size, audio = audio)
+        wave = self.wave(tempo, sample_rate = sample_rate, fadein = fadein, fadeout = fadeout, damp = damp)
+        audio = Note.backend(audio)
+        audio.play(wave, samplerate=sample_rate)
+        audio.wait()
+
+    def play_async(self, tempo = 120, sample_rate = 44100, fadein = 0.05, fadeout = 0.05, damp = 0, player = None, audio = None):
+        #plays the note without waiting for it, right after what was queued before (see Note.array.play_async)
+        return Note.array([self]).play_async(tempo, sample_rate = sample_rate, fadein = fadein, fadeout = fadeout, damp = damp,
+                                             player = player, audio = audio)
 
-        unity = np.array((audio.size-fadeout_length-fadein_length) * [1], dtype=np.int16)
+    @staticmethod
+    def resample(wave, sample_rate, new_sample_rate, size):
+        #returns size samples at new_sample_rate from a wave at sample_rate, by linear interpolation
+        if wave.size == 0:
+            return np.zeros(size, dtype=wave.dtype)
+        times = np.arange(size) * (1 / new_sample_rate)
+        return np.interp(times, np.arange(wave.size) * (1 / sample_rate), wave, right=0).astype(wave.dtype, copy=False)
 
-        unity = np.append(fade_in(fadein_length),unity)
-        unity = np.append(unity,fade_out(fadeout_length))
+    sample_formats = {"int16": (2, 1), "int24": (3, 1), "float32": (4, 3)} #bytes per sample, wav format tag
 
-        return audio*unity
+    @staticmethod
+    def pcm(block, sample_format = "int16"):
+        #converts float samples to the bytes of a sample format, clipping them to [-1, 1] for the integer formats
+        if sample_format == "float32":
+            return block.astype("<f4").tobytes()
+        block = np.clip(block, -1, 1)
+        if sample_format == "int16":
+            return np.round(block*32767).astype("<i2").tobytes()
+        if sample_format == "int24":
+            return np.round(block*8388607).astype("<i4").view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+        raise Exception("'sample_format' parameter must be one of the following: 'int16', 'int24', 'float32'")
 
-    def play(self,tempo = 120, sample_rate=44100, fadein = 0.05, fadeout = 0.05, damp = 0):
-        audio = self.wave(tempo, sample_rate = sample_rate, fadein = fadein, fadeout = fadeout, damp = damp)
-        sd.play(audio, samplerate=44100)
-        sd.wait()
+    @staticmethod
+    def wav_header(total, sample_rate = 44100, sample_format = "int16"):
+        #the 44 byte header of a mono wav file with total samples.
+        #a data chunk of an odd number of bytes (int24) is followed by a pad byte, which is counted in the RIFF size
+        width, tag = Note.sample_formats[sample_format]
+        size = total*width
+        return (b"RIFF" + struct.pack("<I", 36 + size + size % 2) + b"WAVE" +
+                b"fmt " + struct.pack("<IHHIIHH", 16, tag, 1, sample_rate, sample_rate*width, width, 8*width) +
+                b"data" + struct.pack("<I", size))
+
+    @staticmethod
+    def write_wav(path, blocks, total, sample_rate = 44100, sample_format = "int16", header = True, memmap = False):
+        #writes blocks of samples (total samples in all) to a mono wav file, or to a raw pcm file if header is False.
+        #every block is written as soon as it comes, memmap = True writes them into a memory mapped file instead.
+        if sample_format not in Note.sample_formats:
+            raise Exception("'sample_format' parameter must be one of the following: 'int16', 'int24', 'float32'")
+        size = total*Note.sample_formats[sample_format][0]
+        start = 44 if header else 0
+        pad = size % 2 if header else 0 #the pad byte of an odd data chunk
+        with open(path, "wb") as file:
+            if header:
+                file.write(Note.wav_header(total, sample_rate, sample_format))
+            if memmap:
+                file.truncate(start + size + pad)
+            else:
+                for block in blocks:
+                    file.write(Note.pcm(block, sample_format))
+                file.write(b"\x00"*pad)
+                return
+        if size == 0:
+            return
+        data = np.memmap(path, dtype=np.uint8, mode="r+", offset=start, shape=(size,))
+        position = 0
+        for block in blocks:
+            pcm = np.frombuffer(Note.pcm(block, sample_format), dtype=np.uint8)
+            data[position:position+pcm.size] = pcm
+            position += pcm.size
+        data.flush()
+        del data
 
     class array:
         #a class to contain note(s)
         # initialize by my_notes = Notes.array([my_note,my_note2])
+        # the notes are stored as columns: MIDI numbers (int16), durations, dynamics and an index into a table of timbres.
+        # Note objects are only created when the array is indexed or iterated.
         def __init__(self,note_list):
             self.size = len(note_list)
-            self.list = note_list
+            self.keys = np.array([i.key() for i in note_list], dtype=np.int16)
+            self.durations = np.array([i.duration for i in note_list], dtype=np.float64)
+            self.dynamics = np.array([i.dynamic for i in note_list], dtype=np.float64)
+            self.timbres = []
+            self.timbre_index = np.array([self.timbre_id(i.timbre) for i in note_list], dtype=np.int32)
+
+        @staticmethod
+        def bycolumns(keys, durations=1, dynamics=0.25, timbres=([1],), timbre_index=0):
+            #creates an array directly from columns, without creating Note objects.
+            #timbres is a table of timbres, timbre_index gives the position of every note's timbre in that table.
+            result = Note.array.__new__(Note.array)
+            result.keys = np.array(keys, dtype=np.int16).reshape(-1)
+            result.size = result.keys.size
+            result.durations = np.broadcast_to(np.asarray(durations, dtype=np.float64), result.keys.shape).copy()
+            result.dynamics = np.broadcast_to(np.asarray(dynamics, dtype=np.float64), result.keys.shape).copy()
+            result.timbres = list(timbres)
+            result.timbre_index = np.broadcast_to(np.asarray(timbre_index, dtype=np.int32), result.keys.shape).copy()
+            return result
+
+        @staticmethod
+        def byfreq(frequencies, durations=1, dynamics=0.25, timbres=([1],), timbre_index=0):
+            #creates an array from an array of frequencies, rounded to the closest notes (see Note.keys_byfreq).
+            #frequencies that are 0, negative or NaN (frames without a pitch, as pitch trackers give them) become rests (dynamic 0)
+            frequencies = np.asarray(frequencies, dtype=np.float64).reshape(-1)
+            voiced = np.isfinite(frequencies) & (frequencies > 0)
+            keys = np.full(frequencies.size, Note.es.key(), dtype=np.int64)
+            keys[voiced] = Note.keys_byfreq(frequencies[voiced])
+            dynamics = np.where(voiced, np.asarray(dynamics, dtype=np.float64), 0)
+            return Note.array.bycolumns(keys, durations, dynamics, timbres, timbre_index)
+
+        @staticmethod
+        def join(arrays):
+            #concatenates note arrays into one, merging their timbre tables
+            result = Note.array([])
+            index = []
+            for i in arrays:
+                table = np.array([result.timbre_id(j) for j in i.timbres], dtype=np.int32)
+                index.append(table[i.timbre_index])
+            result.keys = np.concatenate([result.keys]+[i.keys for i in arrays])
+            result.durations = np.concatenate([result.durations]+[i.durations for i in arrays])
+            result.dynamics = np.concatenate([result.dynamics]+[i.dynamics for i in arrays])
+            result.timbre_index = np.concatenate([result.timbre_index]+index)
+            result.size = result.keys.size
+            return result
+
+        #an array can also be a view over another array (its base): repetitions, reversals, slices and transpositions
+        #return views, whose i-th note is base[(start + i*step) % len(base)] transposed by transposition.
+        #a view gets its own columns (it is materialized) the first time they are needed, e.g. when it is mutated;
+        #wave(), tone() and duration() work on the base when they can.
+        base = None
+        shared = None #the base of the views of the array: it uses the same columns, which are copied before they are mutated
+
+        column_names = ("keys", "durations", "dynamics", "timbre_index")
+
+        def __getattr__(self, name):
+            #only called for attributes that are not set: the columns of a view that is not materialized yet
+            if name not in Note.array.column_names or self.__dict__.get("base") is None:
+                raise AttributeError(name)
+            self.materialize()
+            return self.__dict__[name]
+
+        def view(self, start = 0, step = 1, size = None, transposition = 0):
+            #returns a view whose i-th note is self[start + i*step] transposed by transposition (indexes wrap around self)
+            if size is None:
+                size = self.size
+            if self.base is None:
+                base = self.share()
+            else:
+                base = self.base
+                start, step, transposition = self.start + start*self.step, step*self.step, transposition + self.transposition
+            if base.size == 0 or size == 0:
+                return Note.array([])
+            result = Note.array.__new__(Note.array)
+            result.base, result.start, result.step = base, start % base.size, step
+            result.size, result.transposition = size, transposition
+            result.timbres = list(base.timbres)
+            return result
+
+        def share(self):
+            #returns an array that uses the columns of self (the base of its views),
+            #from then on the columns of self are copied before it is mutated
+            if self.shared is None:
+                self.shared = Note.array.__new__(Note.array)
+                self.shared.keys, self.shared.durations, self.shared.dynamics = self.keys, self.durations, self.dynamics
+                self.shared.timbre_index, self.shared.timbres, self.shared.size = self.timbre_index, list(self.timbres), self.size
+            return self.shared
+
+        def materialize(self):
+            #gives a view its own columns
+            if self.base is None:
+                return self
+            base, index = self.base, (self.start + np.arange(self.size)*self.step) % self.base.size
+            self.keys = base.keys[index] + self.transposition
+            self.durations, self.dynamics, self.timbre_index = base.durations[index], base.dynamics[index], base.timbre_index[index]
+            self.base = None
+            return self
+
+        def periodic(self):
+            #True if the notes repeat the base every len(base) notes, so that a repetition of the view is a view too
+            return self.base is None or (abs(self.step) == 1 and self.size % self.base.size == 0)
+
+        def repeats(self):
+            #True for a view with step 1 or -1 that has every note of its base, so that counts() costs no more than the view.
+            #a shorter view (a slice) reads only its own notes, from the columns it gets when it is materialized
+            return self.base is not None and abs(self.step) == 1 and self.size >= self.base.size
+
+        def counts(self):
+            #for a view with step 1 or -1: how many times every note of the base appears in it
+            full, rest = divmod(self.size, self.base.size)
+            counts = np.full(self.base.size, full, dtype=np.int64)
+            counts[(self.start + np.arange(rest)*self.step) % self.base.size] += 1
+            return counts
+
+        def timbre_id(self,timbre):
+            #returns the position of a timbre in the timbre table, adding it if it is not there
+            for i in range(len(self.timbres)):
+                if self.timbres[i] is timbre:
+                    return i
+            timbre_tuple = tuple(timbre)
+            for i in range(len(self.timbres)):
+                if tuple(self.timbres[i]) == timbre_tuple:
+                    return i
+            self.timbres.append(timbre)
+            return len(self.timbres)-1
+
+        def columns(self,index):
+            #returns the columns of the selected notes as a new array
+            return Note.array.bycolumns(self.keys[index], self.durations[index], self.dynamics[index],
+                                        self.timbres, self.timbre_index[index])
+
+        @staticmethod
+        def number(x):
+            #converts a numpy number to int if it is whole, to float otherwise
+            x = float(x)
+            if x.is_integer():
+                return int(x)
+            return x
 
         def __getitem__(self,index):
-            if isinstance(index, int):
-                return self.list[index]
+            if isinstance(index, (int, np.integer)):
+                array, shift = self, 0
+                if self.base is not None:
+                    if not -self.size <= index < self.size:
+                        raise IndexError("index "+str(index)+" is out of bounds for size "+str(self.size))
+                    array, shift = self.base, self.transposition
+                    index = (self.start + (index % self.size)*self.step) % self.base.size
+                return Note.bykey(int(array.keys[index]) + shift, duration=Note.array.number(array.durations[index]),
+                                  dynamic=float(array.dynamics[index]), timbre=array.timbres[array.timbre_index[index]])
             elif isinstance(index, slice):
-                return Note.array(self.list[index])
+                start, stop, step = index.indices(self.size)
+                return self.view(start, step, len(range(start, stop, step)))
             else:
                 raise TypeError("Index must be integer or slice.")
 
         def __setitem__(self, index, value):
-            self.list[index] = value
+            self.materialize()
+            if self.shared is not None:
+                #views use the columns, they are left as they are
+                self.keys, self.durations, self.dynamics = self.keys.copy(), self.durations.copy(), self.dynamics.copy()
+                self.timbre_index, self.shared = self.timbre_index.copy(), None
+            if isinstance(index, (int, np.integer)):
+                if type(value) != Note:
+                    raise TypeError("Only a Note object can be assigned to an index.")
+                self.keys[index] = value.key()
+                self.durations[index] = value.duration
+                self.dynamics[index] = value.dynamic
+                self.timbre_index[index] = self.timbre_id(value.timbre)
+            elif isinstance(index, slice):
+                if type(value) != Note.array:
+                    value = Note.array(value)
+                start, stop, step = index.indices(self.size)
+                if step == 1:
+                    stop = max(start, stop)
+                    result = Note.array.join([self[:start], value, self[stop:]])
+                else:
+                    positions = np.arange(start, stop, step)
+                    if positions.size != value.size:
+                        raise ValueError("attempt to assign sequence of size "+str(value.size)+" to extended slice of size "+str(positions.size))
+                    result = Note.array.join([self, value])
+                    result.keys[positions] = value.keys
+                    result.durations[positions] = value.durations
+                    result.dynamics[positions] = value.dynamics
+                    result.timbre_index[positions] = result.timbre_index[self.size:]
+                    result = result[:self.size]
+                self.keys, self.durations, self.dynamics = result.keys, result.durations, result.dynamics
+                self.timbres, self.timbre_index, self.size = result.timbres, result.timbre_index, result.size
+            else:
+                raise TypeError("Index must be integer or slice.")
 
         def __len__(self):
-            return len(self.list)
+            return self.size
+
+        def __iter__(self):
+            for i in range(self.size):
+                yield self[i]
+
+        @property
+        def list(self):
+            #the notes as a tuple of Note objects. it is a snapshot, the array is changed by my_array[i] = my_note
+            return tuple(self)
 
         #below methods return the methods of every note, as a list
 
         def set(self):
-            return [i.set() for i in self]
+            return [Note.sets[i] for i in (self.keys % 12).tolist()]
 
         def key(self):
-            return [i.key() for i in self]
+            return self.keys.tolist()
 
         def frequency(self):
-            return [i.frequency() for i in self]
+            return (440*2**((self.keys-69)/12)).tolist()
 
         def transpose(self, semitone = 1):
             #transposes all the notes by semitone input.
-            return Note.array([i.add1(semitone) for i in self])
+            if type(semitone) != int:
+                raise Exception("'semitone' parameter must be an integer.")
+            return self.view(transposition = semitone)
 
         def change_duration(self,new_duration):
-            return Note.array([i.change_duration(new_duration) for i in self])
+            return Note.array.bycolumns(self.keys, new_duration, self.dynamics, self.timbres, self.timbre_index)
 
         def change_dynamic(self,new_dynamic):
-            return Note.array([i.change_dynamic(new_dynamic) for i in self])
+            return Note.array.bycolumns(self.keys, self.durations, new_dynamic, self.timbres, self.timbre_index)
 
         def display(self):
             for i in self:
@@ -408,17 +1221,17 @@ class Note:
             if type(other) == int:
                 return self.transpose(other)
             elif type(other) == Note.array:
-                return Note.array(self.list + other.list)
+                return Note.array.join([self, other])
             elif type(other) == Note:
-                return Note.array(self.list + [other])
+                return Note.array.join([self, Note.array([other])])
 
         def __radd__(self,other):
             if type(other) == int:
                 return self.transpose(other)
             elif type(other) == Note.array:
-                return Note.array(self.list + other.list)
+                return Note.array.join([self, other])
             elif type(other) == Note:
-                return Note.array([other]+self.list)
+                return Note.array.join([Note.array([other]), self])
 
         def __sub__(self,other):
             if type(other) == int:
@@ -428,16 +1241,13 @@ class Note:
         def __mul__(self,other):
             #multiplying by integer will create that much copies and unify them.
             #if the integer is negative, the same operation happens with the reversed list.
-            if type(other) == int and other > 0:
-                result = self.list
-                for i in range(other-1):
-                    result = result + self.list
-                return Note.array(result)
-            elif type(other) == int and other < 0:
-                result = [self[-i] for i in range(1,self.size+1)]
-                for i in range(-other-1):
-                    result = [self[-i] for i in range(1,self.size+1)] + result
-                return Note.array(result)
+            #the copies are a view (see view()), nothing is copied.
+            if type(other) == int and other != 0:
+                if not self.periodic():
+                    self.materialize()
+                if other > 0:
+                    return self.view(0, 1, other*self.size)
+                return self.view(-1, -1, -other*self.size)
             return
 
         def __rmul__(self,other):
@@ -447,39 +1257,96 @@ class Note:
             return self.__mul__(-1)
 
         def duration(self):
-            total = 0
-            for i in self:
-                total += i.duration
-            return total
+            if self.repeats():
+                return Note.array.number(self.counts() @ self.base.durations)
+            return Note.array.number(self.durations.sum())
 
         def add(self,add=1,tone = None, scale = "major"):
-            return Note.array([i.add(add=add,tone=tone,scale=scale) for i in self])
+            #Note.add for every note, computed for all of them at once from the tables of Note.degrees
+            sounding = np.flatnonzero(self.dynamics != 0)
+            if sounding.size == 0:
+                return self[:]
+            self[int(sounding[0])].add(add=add, tone=tone, scale=scale) #checks the parameters as Note.add does
+            if add == 0:
+                return self[:]
+            intervals = Note.scale_intervals(scale)
+            keys = self.keys.astype(np.int64)
+            if tone is None:
+                shift = Note.degree_semitones(add, intervals)
+            else:
+                difference = (keys[sounding] - Note.parse(tone+"0")[1]) % 12
+                steps = Note.degrees(intervals)[2]
+                first_steps = np.array([steps.get(i, -1) for i in range(12)])[difference]
+                if (first_steps < 0).any():
+                    raise Exception("Note object is not in root note's chord.")
+                shift = Note.degree_semitones(add + first_steps, intervals) - difference
+            keys[sounding] += shift
+            return Note.array.bycolumns(keys, self.durations, self.dynamics, self.timbres, self.timbre_index)
 
         def sort(self,mode = "duration",reverse = False):
             if mode == "duration":
-                attributes = [i.duration for i in self]
-                sorted_index = sorted(range(self.size), key = lambda k: attributes[k],reverse=reverse)
-                return Note.array([self[i] for i in sorted_index])
+                attributes = self.durations
             elif mode == "pitch":
-                attributes = [i.key() for i in self]
-                sorted_index = sorted(range(self.size), key=lambda k: attributes[k], reverse=reverse)
-                return Note.array([self[i] for i in sorted_index])
+                attributes = self.keys
             elif mode == "dynamic":
-                attributes = [i.dynamic for i in self]
-                sorted_index = sorted(range(self.size), key=lambda k: attributes[k], reverse=reverse)
-                return Note.array([self[i] for i in sorted_index])
+                attributes = self.dynamics
             else:
                 raise Exception("'mode' parameter must be one of the following: 'duration', 'pitch', 'dynamic'")
-
-        def tone(self,aslist=True,probabilistic = False,probability_base = 10, scales = 0, hidden = 0):
-            # returns a list of pairs that contain the possible tone of a given note array
-            # if probabilistic == False, any note within the array that is out of a tone will exclude that tone from the result
-            # else, the duration of the notes will affect the result:
-            #   the longer a note ise, the higher the probability parameter of the tones it might belong well be.
-            #   the result is a list of tuples, sorted according to probability parameter. (tonal center, scale, probablity parameter)
+            if reverse:
+                attributes = -attributes.astype(np.float64)
+            return self.columns(np.argsort(attributes, kind="stable"))
+
+        @staticmethod
+        def templates(scales):
+            #returns the table of every scale of the dictionary on every tonic, in the order tone() lists them:
+            #"names": (tonic index, scale name) pairs, "masks": their 12 bit pitch class masks,
+            #"membership": their (templates x 12) membership matrix,
+            #"results": the results of tone() without probabilistic, filled per pitch class mask as they are asked for.
+            #a table is built once for every dictionary content.
+            signature = tuple((name, tuple(scales[name])) for name in scales)
+            if signature not in Note.array.template_cache:
+                names, masks = [], []
+                for name, intervals in signature:
+                    for k in range(12):
+                        mask = 0
+                        for j in intervals:
+                            mask |= 1 << ((k + j) % 12)
+                        names.append((k, name))
+                        masks.append(mask)
+                masks = np.array(masks, dtype=np.int64)
+                membership = ((masks[:, None] >> np.arange(12)) & 1).astype(np.float64)
+                Note.array.template_cache[signature] = {"names": names, "masks": masks, "membership": membership, "results": {}}
+            return Note.array.template_cache[signature]
+
+        template_cache = {}
+
+        def pitch_classes(self):
+            #returns the 12 bit mask of the pitch classes that sound in the array (dynamic != 0),
+            #and the weight of every pitch class: the sum of duration*dynamic**0.25 of its notes.
+            if self.repeats():
+                #every note of the base counts as many times as it appears in the view
+                counts, base = self.counts(), self.base
+                sounding = (base.dynamics != 0) & (counts > 0)
+                classes = (base.keys[sounding] + self.transposition) % 12
+                weights = np.bincount(classes, weights=(counts*base.durations*base.dynamics**0.25)[sounding], minlength=12)
+                mask = int((np.bincount(classes, minlength=12) > 0) @ Note.array.bits)
+                return mask, weights
+            sounding = self.dynamics != 0
+            classes = self.keys[sounding] % 12
+            weights = np.bincount(classes, weights=self.durations[sounding]*self.dynamics[sounding]**0.25, minlength=12)
+            mask = int((np.bincount(classes, minlength=12) > 0) @ Note.array.bits)
+            return mask, weights
+
+        bits = 1 << np.arange(12) #the bit of every pitch class in a mask
+
+        @staticmethod
+        def match(mask, weights, aslist=True, probabilistic = False, probability_base = 10, scales = 0, hidden = 0):
+            #the engine of tone() and root(), working on the output of pitch_classes().
+            #without probabilistic, a tone is kept if the mask is a subset of its mask.
+            #with it, every tone gets probability_base**(-weight of the pitch classes out of the tone), by one matrix product,
+            #and the results are normalized to sum to 1.
             if scales == 0:
                 scales = Note.scales
-            result = []
             if type(aslist) != bool:
                 raise Exception("'aslist' parameter must be a boolean.")
             if type(probabilistic) != bool:
@@ -488,43 +1355,48 @@ class Note:
                 space = ""
             else:
                 space = " "
-            for scale in list(scales.keys()):
-                tone_values = 12 * [1]
-                for i in self:
-                    belongs = [(i - j).note_index() for j in scales[scale]]
-                    for k in range(len(tone_values)):
-                        if k not in belongs and i.dynamic != 0:
-                            if probabilistic == False:
-                                tone_values[k] = 0
-                            else:
-                                tone_values[k] *= probability_base**(-i.duration*i.dynamic**0.25)
-                if probabilistic == False:
-                    if 1 in tone_values:
-                        indexes = [item for item, x in enumerate(tone_values) if x == 1]
-                        if aslist == False:
-                            result = result + [(Note.sets[note] + space + scale) for note in indexes]
-                        else:
-                            result = result + [(Note.sets[note], scale) for note in indexes]
-                else:
+            table = Note.array.templates(scales)
+            names, masks, membership = table["names"], table["masks"], table["membership"]
+            if probabilistic == False:
+                #there are only 4096 masks, so the result of every mask is kept in the table once it is computed
+                results = table["results"]
+                if (mask, aslist, space) not in results:
+                    indexes = np.flatnonzero((masks & mask) == mask).tolist()
                     if aslist == False:
-                        result.append([[Note.sets[i]+space+scale, tone_values[i]] for i in range(12)])
-                        x = 1
+                        results[(mask, aslist, space)] = [Note.sets[names[i][0]] + space + names[i][1] for i in indexes]
                     else:
-                        result.append([(Note.sets[i],scale, tone_values[i]) for i in range(12)])
-                        x = 2
-            if probabilistic == True:
-                results = []
-                for i in result:
-                    for j in i:
-                        results.append(j)
-                results = sorted(results, key= lambda k: k[x], reverse=True)
-                normalize = [i[x] for i in results]
-                normalize = sum(normalize)
-                if aslist == True:
-                    result = [(i[0],i[1],i[2]/normalize) for i  in results]
-                else:
-                    result = [(i[0], i[1] / normalize) for i in results]
-            return result
+                        results[(mask, aslist, space)] = [(Note.sets[names[i][0]], names[i][1]) for i in indexes]
+                return list(results[(mask, aslist, space)])
+            values, order = Note.array.probabilities(weights[None, :], membership, probability_base)
+            values, order = values[0].tolist(), order[0].tolist()
+            if aslist == True:
+                return [(Note.sets[names[i][0]], names[i][1], values[i]) for i in order]
+            return [(Note.sets[names[i][0]] + space + names[i][1], values[i]) for i in order]
+
+        @staticmethod
+        def probabilities(weights, membership, probability_base = 10):
+            #the probabilities match() gives every template, for the (pieces x 12) pitch class weights of many pieces.
+            #returns the (pieces x templates) probabilities, and the order of the templates for every piece, most probable first.
+            #the scores are kept as logarithms and normalized by a softmax, so long arrays do not underflow to 0.
+            #the likelihoods are summed pitch class by pitch class, so a piece gets the same values in any batch.
+            likelihoods = np.zeros((weights.shape[0], membership.shape[0]))
+            for k in range(12):
+                likelihoods -= weights[:, k:k+1] * (1 - membership[:, k])
+            likelihoods *= np.log(float(probability_base))
+            order = np.argsort(-likelihoods, axis=1, kind="stable")
+            values = np.exp(likelihoods - likelihoods.max(axis=1, keepdims=True))
+            values /= np.take_along_axis(values, order, axis=1).sum(axis=1, keepdims=True)
+            return values, order
+
+        def tone(self,aslist=True,probabilistic = False,probability_base = 10, scales = 0, hidden = 0):
+            # returns a list of pairs that contain the possible tone of a given note array
+            # if probabilistic == False, any note within the array that is out of a tone will exclude that tone from the result
+            # else, the duration of the notes will affect the result:
+            #   the longer a note ise, the higher the probability parameter of the tones it might belong well be.
+            #   the result is a list of tuples, sorted according to probability parameter. (tonal center, scale, probablity parameter)
+            mask, weights = self.pitch_classes()
+            return Note.array.match(mask, weights, aslist=aslist, probabilistic=probabilistic,
+                                    probability_base=probability_base, scales=scales, hidden=hidden)
 
         def root(self,aslist=True,probabilistic = False, probability_base = 2, chords = 0): #returns the chords to which the notes belong, as string
             # aslist = False return conventional chord names like CM7
@@ -534,6 +1406,261 @@ class Note:
             result = self.tone(aslist=aslist,probabilistic=probabilistic,probability_base=probability_base,scales=chords, hidden = 1)
             return result
 
+        @staticmethod
+        def piece_classes(pieces):
+            #the pitch class masks and (pieces x 12) weights of a list of note arrays and polys, as tone() computes them
+            masks, weights = np.zeros(len(pieces), dtype=np.int64), np.zeros((len(pieces), 12))
+            for i in range(len(pieces)):
+                for voice in (pieces[i].list if type(pieces[i]) == Note.array.poly else [pieces[i]]):
+                    voice_mask, voice_weights = voice.pitch_classes()
+                    masks[i] |= voice_mask
+                    weights[i] += voice_weights
+            return masks, weights
+
+        @staticmethod
+        def score(source, first, last, scales, probabilistic, probability_base, top):
+            #scores the pieces [first, last) of a list or a corpus (or the path of a corpus, in a worker process).
+            #returns their masks, their scores and the first top templates of every piece (see tones)
+            if isinstance(source, str):
+                source = Note.array.corpus(source)
+            if type(source) == Note.array.corpus:
+                masks, weights = source.pitch_classes(first, last)
+            else:
+                masks, weights = Note.array.piece_classes(source[first:last])
+            membership = Note.array.templates(scales)["membership"]
+            if probabilistic:
+                scores, order = Note.array.probabilities(weights, membership, probability_base)
+                return masks, scores, order[:, :top]
+            scores = ((Note.array.templates(scales)["masks"][None, :] & masks[:, None]) == masks[:, None]).astype(np.float64)
+            return masks, scores, None
+
+        @staticmethod
+        def tones(pieces, aslist=True, probabilistic = False, probability_base = 10, scales = 0, hidden = 0, top = 3,
+                  workers = None, chunk_size = 4096):
+            #tone() of many pieces at once: a list of note arrays and polys, or a Note.array.corpus.
+            #returns a dictionary: "names": the (tonic index, scale name) of every template, in the order of Note.array.templates,
+            #"scores": the (pieces x templates) matrix of the probabilities tone(probabilistic = True) gives,
+            #or of 1 where tone(probabilistic = False) keeps a template and 0 elsewhere,
+            #"top": the first top results of tone() for every piece (all of them if top is None).
+            #the pieces are scored chunk_size at a time, by a pool of worker processes if workers > 1 (all cores if None).
+            if scales == 0:
+                scales = Note.scales
+            if type(aslist) != bool:
+                raise Exception("'aslist' parameter must be a boolean.")
+            if type(probabilistic) != bool:
+                raise Exception("'probabilistic' parameter must be a boolean.")
+            table = Note.array.templates(scales)
+            names, size = table["names"], len(pieces)
+            scores = np.zeros((size, len(names)))
+            masks = np.zeros(size, dtype=np.int64)
+            orders = np.zeros((size, len(names) if top is None else min(top, len(names))), dtype=np.int64)
+            chunks = [(first, min(first + chunk_size, size)) for first in range(0, size, chunk_size)]
+            def store(first, last, result):
+                chunk_masks, chunk_scores, chunk_order = result
+                masks[first:last], scores[first:last] = chunk_masks, chunk_scores
+                if chunk_order is not None:
+                    orders[first:last] = chunk_order
+            if workers is None:
+                workers = os.cpu_count()
+            if workers > 1 and len(chunks) > 1:
+                import concurrent.futures #only needed with workers, so it is not imported with the module
+                with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+                    #at most workers*2 chunks are in flight, so only their pieces are pickled and their results waiting at a time
+                    jobs = collections.deque()
+                    for first, last in chunks:
+                        if type(pieces) == Note.array.corpus:
+                            job = pool.submit(Note.array.score, pieces.path, first, last, scales, probabilistic, probability_base, top)
+                        else:
+                            job = pool.submit(Note.array.score, pieces[first:last], 0, last - first, scales, probabilistic, probability_base, top)
+                        jobs.append((first, last, job))
+                        while len(jobs) >= 2*workers or (jobs and last == size):
+                            done_first, done_last, job = jobs.popleft()
+                            store(done_first, done_last, job.result())
+            else:
+                for first, last in chunks:
+                    store(first, last, Note.array.score(pieces, first, last, scales, probabilistic, probability_base, top))
+            space = "" if hidden == 1 else " "
+            if probabilistic == False:
+                results = [Note.array.match(mask, None, aslist=aslist, scales=scales, hidden=hidden)[:top] for mask in masks.tolist()]
+            elif aslist == True:
+                results = [[(Note.sets[names[j][0]], names[j][1], scores[i, j]) for j in orders[i].tolist()] for i in range(size)]
+            else:
+                results = [[(Note.sets[names[j][0]] + space + names[j][1], scores[i, j]) for j in orders[i].tolist()] for i in range(size)]
+            return {"names": names, "scores": scores, "top": results}
+
+        @staticmethod
+        def roots(pieces, aslist=True, probabilistic = False, probability_base = 2, chords = 0, top = 3, workers = None, chunk_size = 4096):
+            #root() of many pieces at once (see tones)
+            if chords == 0:
+                chords = Note.chords
+            return Note.array.tones(pieces, aslist=aslist, probabilistic=probabilistic, probability_base=probability_base,
+                                    scales=chords, hidden=1, top=top, workers=workers, chunk_size=chunk_size)
+
+        class tracker:
+            #follows the tone and the root of a melody over a sliding window of its last notes.
+            #the pitch class weights of the window (as in tone()) are updated as notes enter and leave it,
+            #so a step costs the same no matter how long the melody is. when a note leaves, the weight of its pitch class
+            #is added up again from the notes of that class still in the window, in their order, as tone() adds them,
+            #so that the results are the same as tone(probabilistic = True) of the window, ties included.
+            # initialize by my_tracker = Note.array.tracker(window = 8), then call my_tracker.push(my_note) for every note
+            def __init__(self, window = 8, top = 3, scales = 0, chords = 0, probability_base = 10, chord_probability_base = 2):
+                if type(window) != int or window < 1:
+                    raise Exception("'window' parameter must be a positive integer.")
+                self.window = window
+                self.top = top
+                self.scales = Note.scales if scales == 0 else scales
+                self.chords = Note.chords if chords == 0 else chords
+                self.probability_base = probability_base
+                self.chord_probability_base = chord_probability_base
+                self.notes = collections.deque() #pitch classes of the notes in the window, None for rests
+                self.classes = [collections.deque() for i in range(12)] #weights of the notes of every pitch class in the window
+                self.weights = np.zeros(12)
+
+            def add(self, key, duration, dynamic):
+                #adds a note to the window, dropping the oldest one if the window is full
+                if dynamic != 0:
+                    pitch_class, weight = key % 12, duration*dynamic**0.25
+                    self.notes.append(pitch_class)
+                    self.classes[pitch_class].append(weight)
+                    self.weights[pitch_class] += weight
+                else:
+                    self.notes.append(None)
+                if len(self.notes) > self.window:
+                    pitch_class = self.notes.popleft()
+                    if pitch_class is not None:
+                        self.classes[pitch_class].popleft()
+                        self.weights[pitch_class] = sum(self.classes[pitch_class])
+
+            def mask(self):
+                return sum(1 << i for i in range(12) if self.classes[i])
+
+            def tone(self):
+                #the top tones of the window: (tonal center, scale, probability parameter)
+                return Note.array.match(self.mask(), self.weights, probabilistic=True, probability_base=self.probability_base,
+                                        scales=self.scales)[:self.top]
+
+            def root(self):
+                #the top chords of the window: (root, chord, probability parameter)
+                return Note.array.match(self.mask(), self.weights, probabilistic=True, probability_base=self.chord_probability_base,
+                                        scales=self.chords, hidden=1)[:self.top]
+
+            def push(self, note):
+                #adds a note and returns the top tones and chords of the window
+                self.add(note.key(), note.duration, note.dynamic)
+                return self.tone(), self.root()
+
+            def track(self, notes):
+                #yields (tones, chords) after every note of a Note.array or of any iterable of notes
+                if type(notes) == Note.array:
+                    for key, duration, dynamic in zip(notes.keys.tolist(), notes.durations.tolist(), notes.dynamics.tolist()):
+                        self.add(key, duration, dynamic)
+                        yield self.tone(), self.root()
+                else:
+                    for note in notes:
+                        yield self.push(note)
+
+        def track(self, window = 8, top = 3, scales = 0, chords = 0, probability_base = 10, chord_probability_base = 2):
+            #returns the top tones and chords of the last window notes, after every note of the array
+            tracker = Note.array.tracker(window = window, top = top, scales = scales, chords = chords,
+                                         probability_base = probability_base, chord_probability_base = chord_probability_base)
+            return list(tracker.track(self))
+
+        class index:
+            #an inverted index of the interval n-grams of melodies, to find motifs in them in any key.
+            #the intervals between the sounding notes (dynamic != 0) of every melody are cut into grams of n intervals,
+            #one starting at every note (padded at the end of the melody). a gram is packed into an integer, 8 bits per interval,
+            #and the grams are kept sorted with their positions, so looking a gram up is a binary search.
+            # initialize by my_index = Note.array.index(n = 4), add melodies by my_index.add(my_array), search by my_index.find(motif)
+            def __init__(self, n = 4):
+                if type(n) != int or not 1 <= n <= 7:
+                    raise Exception("'n' parameter must be an integer from 1 to 7.")
+                self.n = n
+                self.size = 0 #number of melodies
+                self.intervals = np.zeros(0, dtype=np.int64) #the intervals of all the melodies, one melody after another
+                self.ends = np.zeros(0, dtype=np.int64) #for every interval: where the intervals of its melody end
+                self.pieces = np.zeros(0, dtype=np.int64) #for every interval: its melody
+                self.notes = np.zeros(0, dtype=np.int64) #for every interval: the index of its first note in its melody
+                self.codes = np.zeros(0, dtype=np.int64) #the grams, sorted
+                self.positions = np.zeros(0, dtype=np.int64) #the position in self.intervals of every gram of self.codes
+                self.pending = [] #(intervals, note indexes) of the melodies added since the grams were last sorted
+
+            def add(self, melody):
+                #adds a melody (a Note.array or a list of notes), returns its number
+                if type(melody) != Note.array:
+                    melody = Note.array(melody)
+                sounding = np.flatnonzero(melody.dynamics != 0)
+                self.pending.append((np.diff(melody.keys[sounding].astype(np.int64)), sounding[:-1]))
+                self.size += 1
+                return self.size - 1
+
+            def update(self):
+                #adds the grams of the pending melodies to the sorted grams
+                if not self.pending:
+                    return
+                first, n = self.intervals.size, self.n
+                intervals = [i[0] for i in self.pending]
+                lengths = np.array([i.size for i in intervals], dtype=np.int64)
+                #the symbols of the intervals (1...255), every melody followed by n zeros so that no gram crosses melodies
+                symbols = np.zeros(int(lengths.sum()) + n*len(intervals), dtype=np.int64)
+                real = np.ones(symbols.size, dtype=bool)
+                starts = np.cumsum(np.concatenate([[0], lengths[:-1] + n])).astype(np.int64)
+                for start, length in zip(starts.tolist(), lengths.tolist()):
+                    real[start+length:start+length+n] = False
+                symbols[real] = np.clip(np.concatenate(intervals), -127, 127) + 128
+                codes = np.zeros(symbols.size - n + 1, dtype=np.int64)
+                for j in range(n):
+                    codes |= symbols[j:j+codes.size] << (8*(n-1-j))
+                codes = codes[real[:codes.size]]
+                ends = first + np.cumsum(lengths)
+                self.intervals = np.concatenate([self.intervals] + intervals)
+                self.ends = np.concatenate([self.ends, np.repeat(ends, lengths)])
+                self.pieces = np.concatenate([self.pieces, np.repeat(np.arange(self.size - len(intervals), self.size), lengths)])
+                self.notes = np.concatenate([self.notes] + [i[1] for i in self.pending])
+                #only the new grams are sorted, then merged into the sorted ones after the equal grams that are there already
+                order = np.argsort(codes, kind="stable")
+                codes, positions = codes[order], np.arange(first, self.intervals.size)[order]
+                places = np.searchsorted(self.codes, codes, side="right")
+                self.codes = np.insert(self.codes, places, codes)
+                self.positions = np.insert(self.positions, places, positions)
+                self.pending = []
+
+            def lookup(self, intervals):
+                #the positions of the grams that start with the given intervals (at most n of them)
+                prefix = 0
+                for i in np.clip(intervals, -127, 127).tolist():
+                    prefix = (prefix << 8) | (i + 128)
+                shift = 8*(self.n - len(intervals))
+                low, high = np.searchsorted(self.codes, [prefix << shift, (prefix + 1) << shift])
+                return self.positions[low:high]
+
+            def find(self, motif, mismatches = 0):
+                #returns the (melody, note index) of every place where the intervals of a motif (a Note.array or a list of notes)
+                #appear, in any key. with mismatches > 0, up to that many intervals may differ.
+                #the motif is cut into mismatches+1 parts, one of which must appear as it is; their grams give the
+                #candidates, whose intervals are then compared to the motif's.
+                if type(mismatches) != int or mismatches < 0:
+                    raise Exception("'mismatches' parameter must be a non-negative integer.")
+                if type(motif) != Note.array:
+                    motif = Note.array(motif)
+                motif = np.diff(motif.keys[motif.dynamics != 0].astype(np.int64))
+                if motif.size == 0:
+                    raise Exception("'motif' parameter must have at least two sounding notes.")
+                self.update()
+                part = motif.size // (mismatches + 1)
+                if part == 0:
+                    candidates = np.arange(self.intervals.size)
+                else:
+                    length = min(part, self.n)
+                    candidates = np.unique(np.concatenate([self.lookup(motif[i*part:i*part+length]) - i*part
+                                                           for i in range(mismatches + 1)]))
+                    candidates = candidates[candidates >= 0]
+                candidates = candidates[candidates + motif.size <= self.ends[candidates]]
+                differences = np.zeros(candidates.size, dtype=np.int64)
+                for j in range(motif.size):
+                    differences += self.intervals[candidates + j] != motif[j]
+                found = candidates[differences <= mismatches]
+                return list(zip(self.pieces[found].tolist(), self.notes[found].tolist()))
+
         def consonance(self,n=1): #gives consonance value between multiple notes as an integer
             #the number on its own might not be mean anything.
             #calculate a base consonance with the note itself to compare and get a relevant result.
@@ -548,30 +1675,356 @@ class Note:
             with the lower note held constant:
             octave, unison, perfect fifth, major sixth, perfect fourth, minor seventh, major third, minor sixth, tritone, minor third, major seventh, major second, minor second
             """
-            keys = [i.key() for i in self]
-            sep = max(keys) - min(keys)
-            subharmonics = [[j.subharmonic(i).key() for i in range(1,sep+20+1)] for j in self]
-            for i in range(sep+20):
-                for j in range(1,len(subharmonics)):
-                    current = subharmonics[0][i]
-                    for k in range(sep+20):
-                        found = True
-                        if subharmonics[j][k] != current:
-                            found = False
-                        if found == True:
-                            return current
-
-
-        def wave(self, tempo = 120, sample_rate=44100, fadein = 0.05, fadeout = 0.05,damp = 0):
-            wave1 = np.array([])
-            for i in self:
-                wave1 = np.append(wave1,i.wave(tempo = tempo, sample_rate=sample_rate, fadein = fadein, fadeout = fadeout,damp = damp))
-            return wave1
+            keys = self.keys.astype(np.int64)
+            sep = int(keys.max() - keys.min())
+            offsets = Note.subharmonic_offsets(sep+20)
+            #the first subharmonic of the first note that is a subharmonic of any other note
+            others = set((keys[1:, None] + offsets).ravel().tolist())
+            for i in (keys[0] + offsets).tolist():
+                if i in others:
+                    return i
+
+        consonance_shifts = {} #key difference -> semitones from the upper note of a pair to its common subharmonic
+
+        @staticmethod
+        def consonance_shift(difference):
+            #for a pair of notes whose keys differ by difference (first - second), the semitones from the first note
+            #to the subharmonic consonance() returns for Note.array([first, second]), None if there is none
+            if difference not in Note.array.consonance_shifts:
+                offsets = Note.subharmonic_offsets(abs(difference)+20)
+                others = set((offsets - difference).tolist())
+                shift = None
+                for i in offsets.tolist():
+                    if i in others:
+                        shift = i
+                        break
+                Note.array.consonance_shifts[difference] = shift
+            return Note.array.consonance_shifts[difference]
+
+        def consonance_matrix(self):
+            #returns the (notes x notes) matrix whose [i, j] element is Note.array([self[i], self[j]]).consonance()
+            #(nan where there is no common subharmonic). the pairs only depend on their key difference,
+            #so every difference is computed once.
+            keys = self.keys.astype(np.int64)
+            span = int(keys.max() - keys.min()) if keys.size else 0
+            shifts = np.array([Note.array.consonance_shift(i) for i in range(-span, span+1)], dtype=np.float64)
+            return keys[:, None] + shifts[keys[:, None] - keys[None, :] + span]
+
+        def samples(self, tempo = 120, sample_rate = 44100):
+            #returns the number of samples of every note when rendered
+            return np.maximum(np.ceil(self.durations * 60 / tempo / (1 / sample_rate)), 0).astype(np.int64)
+
+        def onsets(self, tempo = 120, sample_rate = 44100):
+            #returns the first sample of every note, and the total number of samples
+            samples = self.samples(tempo, sample_rate)
+            ends = np.cumsum(samples)
+            total = int(ends[-1]) if ends.size else 0
+            return ends - samples, total
+
+        def signature(self):
+            #a hashable summary of the notes, used as a cache key
+            if self.repeats():
+                return ("view", self.base.signature(), self.start, self.step, self.size, self.transposition)
+            return (self.keys.tobytes(), self.durations.tobytes(), self.dynamics.tobytes(),
+                    self.timbre_index.tobytes(), tuple(tuple(i) for i in self.timbres))
+
+        def wave(self, tempo = 120, sample_rate=44100, fadein = 0.05, fadeout = 0.05,damp = 0, out = None, dtype = np.float64):
+            #the output buffer is allocated once (or given by out) and every note is rendered into its own slice.
+            #dtype is the type of the samples (see Note.wave).
+            if Note.cache is not None:
+                cache_key = ("array", self.signature(), tempo, sample_rate, fadein, fadeout, damp, np.dtype(dtype).str)
+                cached = Note.cache.get(cache_key)
+                if cached is not None:
+                    if out is None:
+                        return cached
+                    if out.size < cached.size:
+                        raise Exception("'out' parameter must have at least "+str(cached.size)+" samples.")
+                    out[:cached.size] = cached
+                    return out[:cached.size]
+            if self.base is not None and abs(self.step) == 1 and self.size > self.base.size:
+                #a repetition: the notes of one period are rendered once and their wave is copied
+                period = self[:self.base.size].materialize()
+                starts, length = period.onsets(tempo, sample_rate)
+                full, rest = divmod(self.size, self.base.size)
+                total = full*length + (int(starts[rest]) if rest else 0)
+                if out is None:
+                    out = np.empty(total, dtype=dtype)
+                elif out.size < total:
+                    raise Exception("'out' parameter must have at least "+str(total)+" samples.")
+                else:
+                    out = out[:total]
+                wave = period.wave(tempo = tempo, sample_rate=sample_rate, fadein = fadein, fadeout = fadeout,damp = damp,
+                                   out = out[:length], dtype = dtype)
+                if length > 0: #a period of notes without samples renders to nothing
+                    for i in range(length, total, length):
+                        out[i:i+length] = wave[:total-i]
+                if Note.cache is not None:
+                    if out.base is None:
+                        return Note.cache.put(cache_key, out)
+                    Note.cache.put(cache_key, out.copy())
+                return out
+            starts, total = self.onsets(tempo, sample_rate)
+            if out is None:
+                out = np.zeros(total, dtype=dtype)
+            elif out.size < total:
+                raise Exception("'out' parameter must have at least "+str(total)+" samples.")
+            else:
+                out = out[:total]
+                out[:] = 0
+            for i in range(self.size):
+                if self.dynamics[i] == 0:
+                    continue
+                start = int(starts[i])
+                note = self[i]
+                note.wave(tempo = tempo, sample_rate=sample_rate, fadein = fadein, fadeout = fadeout,damp = damp,
+                          out = out[start:start+note.samples(tempo, sample_rate)], dtype = dtype)
+            if Note.cache is not None:
+                if out.base is None:
+                    return Note.cache.put(cache_key, out)
+                Note.cache.put(cache_key, out.copy())
+            return out
+
+        @staticmethod
+        def wave_shared(name, first, array, settings):
+            #runs in a worker process: renders a note array into its part of a shared memory block
+            from multiprocessing import shared_memory
+            memory = shared_memory.SharedMemory(name=name)
+            try:
+                dtype = np.dtype(settings["dtype"])
+                out = np.ndarray(array.onsets(settings["tempo"], settings["sample_rate"])[1], dtype=dtype,
+                                 buffer=memory.buf, offset=first*dtype.itemsize)
+                array.wave(out=out, **settings)
+            finally:
+                out = None
+                memory.close()
+
+        @staticmethod
+        def render(arrays, tempo=120, sample_rate=44100, fadein = 0.05, fadeout = 0.05, damp = 0, workers = None, dtype = np.float64):
+            #renders a list of note arrays over a pool of worker processes (all cores if workers is None).
+            #the workers write into one shared memory block instead of sending the waves back.
+            #returns the same list of waves as [i.wave(...) for i in arrays].
+            settings = {"tempo": tempo, "sample_rate": sample_rate, "fadein": fadein, "fadeout": fadeout, "damp": damp, "dtype": dtype}
+            ends = np.cumsum([0]+[i.onsets(tempo, sample_rate)[1] for i in arrays]).tolist()
+            if workers is None:
+                workers = os.cpu_count()
+            if workers < 2 or len(arrays) < 2 or ends[-1] == 0:
+                return [i.wave(**settings) for i in arrays]
+            import concurrent.futures #only needed with workers, so they are not imported with the module
+            from multiprocessing import shared_memory
+            memory = shared_memory.SharedMemory(create=True, size=ends[-1]*np.dtype(dtype).itemsize)
+            try:
+                with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+                    jobs = [pool.submit(Note.array.wave_shared, memory.name, ends[i], arrays[i], settings)
+                            for i in range(len(arrays)) if ends[i+1] > ends[i]]
+                    for job in jobs:
+                        job.result()
+                waves = np.ndarray(ends[-1], dtype=dtype, buffer=memory.buf).copy()
+            finally:
+                memory.close()
+                memory.unlink()
+            return [waves[ends[i]:ends[i+1]] for i in range(len(arrays))]
+
+        def blocks(self, block_size = 1024, tempo = 120, sample_rate = 44100, fadein = 0.05, fadeout = 0.05, damp = 0, dtype = np.float64):
+            #yields the samples of wave() in blocks of block_size
+            return Note.array.poly([self]).blocks(block_size, tempo = tempo, sample_rate = sample_rate, fadein = fadein,
+                                                  fadeout = fadeout, damp = damp, dtype = dtype)
+
+        def to_wav(self, path, tempo=120, sample_rate=44100, fadein = 0.05, fadeout = 0.05, damp = 0,
+                   sample_format = "int16", block_size = 65536, memmap = False, header = True, dtype = np.float64):
+            #exports the notes to a wav file block by block (see poly.to_wav)
+            Note.array.poly([self]).to_wav(path, tempo=tempo, sample_rate=sample_rate, fadein=fadein, fadeout=fadeout, damp=damp,
+                                           sample_format=sample_format, block_size=block_size, memmap=memmap, header=header, dtype=dtype)
+
+        def to_pcm(self, path, tempo=120, sample_rate=44100, fadein = 0.05, fadeout = 0.05, damp = 0,
+                   sample_format = "int16", block_size = 65536, memmap = False, dtype = np.float64):
+            #exports the raw samples of the notes, without a wav header
+            self.to_wav(path, tempo=tempo, sample_rate=sample_rate, fadein=fadein, fadeout=fadeout, damp=damp,
+                        sample_format=sample_format, block_size=block_size, memmap=memmap, header=False, dtype=dtype)
+
+        def to_midi(self, path, tempo = 120, division = 480):
+            #writes the notes to a standard midi file (see poly.to_midi)
+            Note.array.poly([self]).to_midi(path, tempo = tempo, division = division)
+
+        def truncate(self, harmonics):
+            #returns the notes with only the first harmonics of their timbres
+            return Note.array.bycolumns(self.keys, self.durations, self.dynamics, [i[:harmonics] for i in self.timbres], self.timbre_index)
+
+        def preview(self, tempo=120, sample_rate=44100, fadein = 0.05, fadeout = 0.05, damp = 0, preview_rate = 8000,
+                    harmonics = 3, dtype = np.float64, resample = True):
+            #a quick render for listening: the notes are synthesized at preview_rate with their first harmonics only
+            #(harmonics above preview_rate/2 are left out, as in wave()). pitch is the same as in wave(), and every note
+            #starts on the sample of preview_rate closest to its onset in wave() at sample_rate, so the timing does not drift.
+            #the wave is resampled to sample_rate, or returned at preview_rate if resample is False or sample_rate is None
+            #(the timing is then the one of wave() at preview_rate).
+            return Note.array.poly([self]).preview(tempo, sample_rate, fadein=fadein, fadeout=fadeout, damp=damp,
+                                                   preview_rate=preview_rate, harmonics=harmonics, dtype=dtype, resample=resample)
+
+        def play(self, tempo=120, sample_rate=44100, fadein = 0.05, fadeout = 0.05, damp = 0, stream = False, block_size = 1024, audio = None,
+                 preview = False, preview_rate = 8000, harmonics = 3):
+            #stream = True plays the notes block by block (see Note.stream)
+            #preview = True plays preview(), at preview_rate if the backend can play it (nothing is resampled then),
+            #else resampled to sample_rate
+            if preview:
+                audio = Note.backend(audio)
+                native = Note.plays_at(audio, preview_rate)
+                wave = self.preview(tempo, sample_rate=sample_rate, fadein=fadein, fadeout=fadeout, damp=damp,
+                                    preview_rate=preview_rate, harmonics=harmonics, resample=not native)
+                audio.play(wave, samplerate=preview_rate if native else sample_rate)
+                return audio.wait()
+            if stream:
+                blocks = self.blocks(block_size, tempo = tempo, sample_rate = sample_rate, fadein = fadein, fadeout = fadeout, damp = damp)
+                return Note.stream(blocks, sample_rate = sample_rate, block_size = block_size, audio = audio)
+            wave = self.wave(tempo= tempo, sample_rate=sample_rate, fadein = fadein, fadeout = fadeout, damp = damp)
+            audio = Note.backend(audio)
+            audio.play(wave, samplerate=sample_rate)
+            audio.wait()
+
+        def play_async(self, tempo=120, sample_rate=44100, fadein = 0.05, fadeout = 0.05, damp = 0, player = None, audio = None):
+            #plays the notes without waiting for them, right after what was queued before on the player (a Note.PlayQueue,
+            #Note.player if None). returns a handle that can be cancelled, waited for or awaited.
+            if player is None:
+                player = Note.PlayQueue.default(sample_rate, audio)
+            elif player.sample_rate != sample_rate:
+                raise Exception("'sample_rate' parameter must be the sample rate of the player.")
+            return player.put(self.blocks(player.block_size, tempo = tempo, sample_rate = sample_rate, fadein = fadein,
+                                          fadeout = fadeout, damp = damp))
+
+        class corpus:
+            #a file of many pieces (note arrays and polys), stored as columns:
+            #a 64 byte header, then durations, dynamics (float64), the note offsets of the voices, the voice offsets of the pieces,
+            #the value offsets of the timbres (int64), the values of the timbres (float64), the timbre indexes (int32),
+            #the keys (int16) and whether every piece is a poly (uint8). the timbre table is shared by all the pieces.
+            #the file is opened with np.memmap, so reading a piece only touches the pages of its notes.
+            # write by Note.array.corpus.write("pieces.bach", [my_array, my_poly]), read by Note.array.corpus("pieces.bach")[1]
+            magic = b"BACHNOTE"
+
+            @staticmethod
+            def layout(pieces, voices, notes, timbres, values):
+                #the (start, end) bytes of every section of a file with the given counts
+                sizes = [("durations", notes*8), ("dynamics", notes*8), ("voice_offsets", (voices+1)*8),
+                         ("piece_offsets", (pieces+1)*8), ("timbre_offsets", (timbres+1)*8), ("timbre_values", values*8),
+                         ("timbre_index", notes*4), ("keys", notes*2), ("polys", pieces)]
+                sections, position = {}, 64
+                for name, size in sizes:
+                    sections[name] = (position, position+size)
+                    position += size
+                return sections
+
+            @staticmethod
+            def write(path, pieces):
+                #writes a list of note arrays and polys to a corpus file
+                voices, polys = [], []
+                for piece in pieces:
+                    if type(piece) == Note.array:
+                        voices.append(piece)
+                        polys.append(0)
+                    elif type(piece) == Note.array.poly:
+                        voices += piece.list
+                        polys.append(1)
+                    else:
+                        raise Exception("'pieces' parameter must be a list of Note.array and Note.array.poly objects.")
+                piece_offsets = np.cumsum([0]+[len(i.list) if type(i) == Note.array.poly else 1 for i in pieces])
+                voice_offsets = np.cumsum([0]+[i.size for i in voices])
+                ids, timbres, index = {}, [], [] #the timbre table, and the position of every voice's timbres in it
+                for voice in voices:
+                    table = []
+                    for timbre in voice.timbres:
+                        timbre = tuple(float(i) for i in timbre)
+                        if timbre not in ids:
+                            ids[timbre] = len(timbres)
+                            timbres.append(timbre)
+                        table.append(ids[timbre])
+                    index.append(np.array(table, dtype=np.int32))
+                timbre_offsets = np.cumsum([0]+[len(i) for i in timbres])
+                sections = Note.array.corpus.layout(len(pieces), len(voices), int(voice_offsets[-1]), len(timbres), int(timbre_offsets[-1]))
+                with open(path, "wb") as file:
+                    file.write(Note.array.corpus.magic + struct.pack("<QQQQQ", len(pieces), len(voices), int(voice_offsets[-1]),
+                                                                      len(timbres), int(timbre_offsets[-1])).ljust(56, b"\x00"))
+                    for voice in voices:
+                        file.write(np.ascontiguousarray(voice.durations, dtype="<f8").tobytes())
+                    for voice in voices:
+                        file.write(np.ascontiguousarray(voice.dynamics, dtype="<f8").tobytes())
+                    file.write(voice_offsets.astype("<i8").tobytes())
+                    file.write(piece_offsets.astype("<i8").tobytes())
+                    file.write(timbre_offsets.astype("<i8").tobytes())
+                    file.write(np.array([j for i in timbres for j in i], dtype="<f8").tobytes())
+                    for voice, table in zip(voices, index):
+                        file.write(table[voice.timbre_index].astype("<i4").tobytes())
+                    for voice in voices:
+                        file.write(np.ascontiguousarray(voice.keys, dtype="<i2").tobytes())
+                    file.write(np.array(polys, dtype=np.uint8).tobytes())
+                    if file.tell() != sections["polys"][1]:
+                        raise Exception("corpus file was not written correctly.")
+
+            def __init__(self, path):
+                self.path = path
+                with open(path, "rb") as file:
+                    header = file.read(64)
+                if header[:8] != Note.array.corpus.magic:
+                    raise Exception("'path' parameter must be a corpus file written by Note.array.corpus.write.")
+                self.size, self.voices, self.notes, timbres, values = struct.unpack("<QQQQQ", header[8:48])
+                sections = Note.array.corpus.layout(self.size, self.voices, self.notes, timbres, values)
+                data = np.memmap(path, dtype=np.uint8, mode="r")
+                dtypes = {"durations": "<f8", "dynamics": "<f8", "voice_offsets": "<i8", "piece_offsets": "<i8", "timbre_offsets": "<i8",
+                          "timbre_values": "<f8", "timbre_index": "<i4", "keys": "<i2", "polys": np.uint8}
+                for name, (start, end) in sections.items():
+                    setattr(self, name, data[start:end].view(dtypes[name]))
+                offsets = self.timbre_offsets.tolist()
+                self.timbres = [self.timbre_values[offsets[i]:offsets[i+1]].tolist() for i in range(timbres)]
+
+            def pitch_classes(self, first = 0, last = None):
+                #the pitch class masks and (pieces x 12) weights of the pieces [first, last), as tone() computes them,
+                #straight from the columns of the file
+                if last is None:
+                    last = self.size
+                voices = self.piece_offsets[first:last+1].astype(np.int64)
+                notes = self.voice_offsets[voices[0]:voices[-1]+1].astype(np.int64)
+                count = int(voices[-1] - voices[0])
+                keys, durations = self.keys[notes[0]:notes[-1]], self.durations[notes[0]:notes[-1]]
+                dynamics = self.dynamics[notes[0]:notes[-1]]
+                sounding = dynamics != 0
+                index = (np.repeat(np.arange(count), np.diff(notes))[sounding]*12 + keys[sounding] % 12)
+                weights = np.bincount(index, weights=durations[sounding]*dynamics[sounding]**0.25, minlength=count*12).reshape(count, 12)
+                masks = (np.bincount(index, minlength=count*12).reshape(count, 12) > 0) @ Note.array.bits
+                #the voices of every piece are added up in order, as poly.tone does
+                result_masks, result_weights = np.zeros(last-first, dtype=np.int64), np.zeros((last-first, 12))
+                starts, counts = voices[:-1] - voices[0], np.diff(voices)
+                for i in range(int(counts.max()) if counts.size else 0):
+                    pieces = np.flatnonzero(counts > i)
+                    result_masks[pieces] |= masks[starts[pieces] + i]
+                    result_weights[pieces] += weights[starts[pieces] + i]
+                return result_masks, result_weights
+
+            def voice(self, index):
+                #the index-th voice of the file, whose columns are read from the file when they are used
+                first, last = int(self.voice_offsets[index]), int(self.voice_offsets[index+1])
+                result = Note.array.__new__(Note.array)
+                result.keys, result.durations = self.keys[first:last], self.durations[first:last]
+                result.dynamics, result.timbre_index = self.dynamics[first:last], self.timbre_index[first:last]
+                result.size, result.timbres = last - first, list(self.timbres)
+                result.share() #the columns are read only, they are copied if the array is mutated
+                return result
+
+            def __getitem__(self, index):
+                if isinstance(index, (int, np.integer)):
+                    if not -self.size <= index < self.size:
+                        raise IndexError("index "+str(index)+" is out of bounds for size "+str(self.size))
+                    index = int(index) % self.size
+                    first, last = int(self.piece_offsets[index]), int(self.piece_offsets[index+1])
+                    if self.polys[index]:
+                        return Note.array.poly([self.voice(i) for i in range(first, last)])
+                    return self.voice(first)
+                elif isinstance(index, slice):
+                    return [self[i] for i in range(*index.indices(self.size))]
+                else:
+                    raise TypeError("Index must be integer or slice.")
 
-        def play(self, tempo=120, sample_rate=44100, fadein = 0.05, fadeout = 0.05, damp = 0):
-            audio = self.wave(tempo= tempo, sample_rate=sample_rate, fadein = fadein, fadeout = fadeout, damp = damp)
-            sd.play(audio, samplerate=44100)
-            sd.wait()
+            def __len__(self):
+                return self.size
+
+            def __iter__(self):
+                for i in range(self.size):
+                    yield self[i]
 
         class poly: #class to store note arrays.
             def __init__(self,arrays):
@@ -641,24 +2094,361 @@ class Note:
             def add(self, add=1, tone=None, scale="major"):
                 return Note.array.poly([i.add(add=add, tone=tone,scale=scale) for i in self])
 
-            def wave(self, tempo=120, sample_rate=44100, fadein = 0.05, fadeout = 0.05, damp = 0):
-                v1 = self[0].wave(tempo=tempo,sample_rate = sample_rate,fadein = fadein, fadeout = fadeout,damp = damp)
-                if self.size > 1:
-                    for i in range(1,self.size):
-                        v2 = self[i].wave(tempo=tempo,sample_rate = sample_rate, fadein = fadein, fadeout = fadeout, damp = damp)
-                        if len(v1) < len(v2):
-                            res = v2.copy()
-                            res[:len(v1)] += v1
+            def events(self, tempo=120, sample_rate=44100, offsets=None):
+                #flattens the voices into one list of events sorted by their first sample.
+                #returns four arrays: first samples, numbers of samples, voice indexes, note indexes within the voices.
+                #offsets are the starting points of the voices in beats.
+                if offsets is not None and len(offsets) != self.size:
+                    raise Exception("'offsets' parameter must have one value per voice.")
+                empty = np.zeros(0, dtype=np.int64)
+                starts, lengths, voices, indexes = [empty], [empty], [empty], [empty]
+                for i in range(self.size):
+                    onsets = self[i].onsets(tempo, sample_rate)[0]
+                    lengths.append(self[i].samples(tempo, sample_rate))
+                    if offsets is not None:
+                        if offsets[i] < 0:
+                            raise Exception("'offsets' parameter must not be negative.")
+                        onsets = onsets + int(round(offsets[i] * 60 / tempo * sample_rate))
+                    starts.append(onsets)
+                    voices.append(np.full(onsets.size, i, dtype=np.int64))
+                    indexes.append(np.arange(onsets.size, dtype=np.int64))
+                starts, lengths = np.concatenate(starts), np.concatenate(lengths)
+                voices, indexes = np.concatenate(voices), np.concatenate(indexes)
+                order = np.lexsort((voices, starts))
+                return starts[order], lengths[order], voices[order], indexes[order]
+
+            def mix(self, bus, first, events, tempo=120, sample_rate=44100, fadein = 0.05, fadeout = 0.05, damp = 0):
+                #adds the events (as returned by events()) into bus, which holds the samples from first on of the mix.
+                #the events are added in their order, so every sample gets the same sum no matter how the bus is split.
+                starts, lengths, voices, indexes = events
+                scratch = np.empty(int(lengths.max()) if lengths.size else 0, dtype=bus.dtype)
+                last = first + bus.size
+                for start, length, voice, index in zip(starts.tolist(), lengths.tolist(), voices.tolist(), indexes.tolist()):
+                    if self[voice].dynamics[index] == 0:
+                        continue
+                    self[voice][index].wave(tempo=tempo, sample_rate=sample_rate, fadein=fadein, fadeout=fadeout, damp=damp,
+                                            out=scratch[:length], dtype=bus.dtype)
+                    low, high = max(start, first), min(start+length, last)
+                    bus[low-first:high-first] += scratch[low-start:high-start]
+                return bus
+
+            @staticmethod
+            def master(bus, normalize = None, limit = None):
+                #normalize scales the mix so that its peak is the given value, limit clips it to [-limit, limit]
+                if normalize is not None:
+                    peak = np.abs(bus).max() if bus.size else 0
+                    if peak > 0:
+                        bus *= normalize / peak
+                if limit is not None:
+                    np.clip(bus, -limit, limit, out=bus)
+                return bus
+
+            @staticmethod
+            def mix_shared(name, total, first, last, poly, events, settings, dtype = np.float64):
+                #runs in a worker process: mixes the samples [first, last) into the shared memory block of the bus
+                from multiprocessing import shared_memory
+                memory = shared_memory.SharedMemory(name=name)
+                try:
+                    bus = np.ndarray(total, dtype=dtype, buffer=memory.buf)
+                    poly.mix(bus[first:last], first, events, **settings)
+                finally:
+                    bus = None
+                    memory.close()
+
+            def wave(self, tempo=120, sample_rate=44100, fadein = 0.05, fadeout = 0.05, damp = 0, offsets = None, normalize = None, limit = None, workers = 1,
+                     dtype = np.float64):
+                #every note of every voice is rendered straight into one mix bus, in the order of the events.
+                #offsets are the starting points of the voices in beats.
+                #normalize scales the mix so that its peak is the given value, limit clips it to [-limit, limit].
+                #workers > 1 splits the bus into that many time ranges, mixed by separate processes into shared memory.
+                #the result is the same as with a single worker, sample by sample.
+                #dtype is the type of the samples of the bus (see Note.wave).
+                if Note.cache is not None:
+                    cache_key = ("poly", tuple(i.signature() for i in self), tempo, sample_rate, fadein, fadeout, damp,
+                                 None if offsets is None else tuple(offsets), normalize, limit, np.dtype(dtype).str)
+                    cached = Note.cache.get(cache_key)
+                    if cached is not None:
+                        return cached
+                settings = {"tempo": tempo, "sample_rate": sample_rate, "fadein": fadein, "fadeout": fadeout, "damp": damp}
+                events = self.events(tempo, sample_rate, offsets)
+                starts, lengths = events[0], events[1]
+                total = int((starts + lengths).max()) if starts.size else 0
+                if workers is None:
+                    workers = os.cpu_count()
+                if workers > 1 and total > 0:
+                    import concurrent.futures #only needed with workers, so they are not imported with the module
+                    from multiprocessing import shared_memory
+                    memory = shared_memory.SharedMemory(create=True, size=total*np.dtype(dtype).itemsize)
+                    try:
+                        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+                            bounds = np.linspace(0, total, workers+1).astype(np.int64).tolist()
+                            jobs = []
+                            for first, last in zip(bounds[:-1], bounds[1:]):
+                                inside = (starts < last) & (starts + lengths > first)
+                                jobs.append(pool.submit(Note.array.poly.mix_shared, memory.name, total, first, last, self,
+                                                        tuple(i[inside] for i in events), settings, dtype))
+                            for job in jobs:
+                                job.result()
+                        bus = np.ndarray(total, dtype=dtype, buffer=memory.buf).copy()
+                    finally:
+                        memory.close()
+                        memory.unlink()
+                else:
+                    bus = self.mix(np.zeros(total, dtype=dtype), 0, events, **settings)
+                bus = Note.array.poly.master(bus, normalize, limit)
+                if Note.cache is not None:
+                    return Note.cache.put(cache_key, bus)
+                return bus
+
+            def blocks(self, block_size=1024, tempo=120, sample_rate=44100, fadein = 0.05, fadeout = 0.05, damp = 0, offsets = None, limit = None,
+                       dtype = np.float64):
+                #yields the samples of wave() in blocks of block_size (the last one may be shorter).
+                #a note is rendered when the block it starts in is reached, and the part of it
+                #that goes beyond that block is kept in a pending buffer for the next blocks.
+                #the pending buffer is a ring: sample n of the mix is at n % its size, so nothing is moved between blocks.
+                starts, lengths, voices, indexes = self.events(tempo, sample_rate, offsets)
+                total = int((starts + lengths).max()) if starts.size else 0
+                longest = int(lengths.max()) if lengths.size else 0
+                pending = np.zeros(block_size + longest, dtype=dtype)
+                scratch = np.empty(longest, dtype=dtype)
+                event = 0
+                for first in range(0, total, block_size):
+                    last = min(first + block_size, total)
+                    while event < starts.size and starts[event] < last:
+                        start, length, voice, index = int(starts[event]), int(lengths[event]), int(voices[event]), int(indexes[event])
+                        event += 1
+                        if self[voice].dynamics[index] == 0:
+                            continue
+                        self[voice][index].wave(tempo=tempo, sample_rate=sample_rate, fadein=fadein, fadeout=fadeout, damp=damp,
+                                                out=scratch[:length], dtype=dtype)
+                        position = start % pending.size
+                        head = min(length, pending.size - position)
+                        pending[position:position+head] += scratch[:head]
+                        pending[:length-head] += scratch[head:length]
+                    position = first % pending.size
+                    head = min(last - first, pending.size - position)
+                    block = np.concatenate([pending[position:position+head], pending[:last-first-head]])
+                    pending[position:position+head] = 0
+                    pending[:last-first-head] = 0
+                    if limit is not None:
+                        np.clip(block, -limit, limit, out=block)
+                    yield block
+
+            def to_wav(self, path, tempo=120, sample_rate=44100, fadein = 0.05, fadeout = 0.05, damp = 0, offsets = None, limit = None,
+                       sample_format = "int16", block_size = 65536, memmap = False, header = True, dtype = np.float64):
+                #exports the mix to a wav file ('int16', 'int24' or 'float32' samples), rendering and writing one block at a time.
+                #header = False writes raw pcm samples.
+                starts, lengths = self.events(tempo, sample_rate, offsets)[:2]
+                total = int((starts + lengths).max()) if starts.size else 0
+                blocks = self.blocks(block_size, tempo=tempo, sample_rate=sample_rate, fadein=fadein, fadeout=fadeout, damp=damp,
+                                     offsets=offsets, limit=limit, dtype=dtype)
+                Note.write_wav(path, blocks, total, sample_rate=sample_rate, sample_format=sample_format, header=header, memmap=memmap)
+
+            def to_pcm(self, path, tempo=120, sample_rate=44100, fadein = 0.05, fadeout = 0.05, damp = 0, offsets = None, limit = None,
+                       sample_format = "int16", block_size = 65536, memmap = False, dtype = np.float64):
+                #exports the raw samples of the mix, without a wav header
+                self.to_wav(path, tempo=tempo, sample_rate=sample_rate, fadein=fadein, fadeout=fadeout, damp=damp, offsets=offsets,
+                            limit=limit, sample_format=sample_format, block_size=block_size, memmap=memmap, header=False, dtype=dtype)
+
+            @staticmethod
+            def read_number(data, position):
+                #reads a variable length number of a midi file, returns it and the position after it
+                value = 0
+                while True:
+                    byte = data[position]
+                    position += 1
+                    value = (value << 7) | (byte & 0x7F)
+                    if byte < 0x80:
+                        return value, position
+
+            @staticmethod
+            def number_bytes(value):
+                #the bytes of a variable length number of a midi file
+                result = [value & 0x7F]
+                value >>= 7
+                while value:
+                    result.append(0x80 | (value & 0x7F))
+                    value >>= 7
+                return bytes(result[::-1])
+
+            @staticmethod
+            def bymidi(path, by = "track"):
+                #reads a standard midi file (its path or its bytes) in one pass over its events.
+                #the notes of every track (by = "track") or channel (by = "channel") become a voice, notes that overlap
+                #in it go to extra voices, and the gaps between the notes are rests (dynamic 0) so that every note keeps its onset.
+                #keys are the MIDI numbers, durations are in quarter notes and dynamics are velocity/127.
+                #the first tempo of the file is kept in the tempo attribute of the result.
+                if by not in ("track", "channel"):
+                    raise Exception("'by' parameter must be one of the following: 'track', 'channel'")
+                if isinstance(path, (bytes, bytearray)):
+                    data = bytes(path)
+                else:
+                    with open(path, "rb") as file:
+                        data = file.read()
+                if data[:4] != b"MThd":
+                    raise Exception("'path' parameter must be a standard midi file.")
+                length, format, count, division = struct.unpack(">IHHH", data[4:14])
+                if division & 0x8000:
+                    raise Exception("midi files with SMPTE time division are not supported.")
+                read_number = Note.array.poly.read_number
+                groups = {} #track or channel -> (onset, end, key, velocity) of its notes, in ticks
+                tempo = None
+                position = 8 + length
+                for track in range(count):
+                    if data[position:position+4] != b"MTrk":
+                        raise Exception("'path' parameter must be a standard midi file.")
+                    end = position + 8 + struct.unpack(">I", data[position+4:position+8])[0]
+                    position += 8
+                    tick, status, playing = 0, 0, {} #playing: (channel, key) -> (onset, velocity) of the notes that are on
+                    while position < end:
+                        delta, position = read_number(data, position)
+                        tick += delta
+                        if data[position] & 0x80:
+                            status = data[position]
+                            position += 1
+                        kind = status & 0xF0
+                        if status == 0xFF:
+                            meta = data[position]
+                            size, position = read_number(data, position+1)
+                            if meta == 0x51 and tempo is None:
+                                tempo = 60000000 / int.from_bytes(data[position:position+3], "big")
+                            position += size
+                            if meta == 0x2F:
+                                break
+                        elif status == 0xF0 or status == 0xF7:
+                            size, position = read_number(data, position)
+                            position += size
+                        elif kind == 0x80 or kind == 0x90:
+                            key, velocity = data[position], data[position+1]
+                            position += 2
+                            channel = status & 0x0F
+                            if kind == 0x90 and velocity > 0:
+                                playing.setdefault((channel, key), []).append((tick, velocity))
+                            elif playing.get((channel, key)):
+                                onset, velocity = playing[(channel, key)].pop(0)
+                                groups.setdefault(track if by == "track" else channel, []).append((onset, tick, key, velocity))
+                        elif kind == 0xC0 or kind == 0xD0:
+                            position += 1
                         else:
-                            res = v1.copy()
-                            res[:len(v2)] += v2
-                        v1 = res
-                return v1
+                            position += 2
+                    for (channel, key), notes in playing.items():
+                        #notes that are never turned off end with the track
+                        for onset, velocity in notes:
+                            groups.setdefault(track if by == "track" else channel, []).append((onset, tick, key, velocity))
+                    position = end
+                voices = []
+                for group in sorted(groups):
+                    ends, parts = [], [] #the last tick and the notes of every voice of the group
+                    for note in sorted(groups[group]):
+                        for i in range(len(ends)):
+                            if ends[i] <= note[0]:
+                                break
+                        else:
+                            i = len(ends)
+                            ends.append(0)
+                            parts.append([])
+                        ends[i] = note[1]
+                        parts[i].append(note)
+                    for part in parts:
+                        part = np.array(part, dtype=np.int64)
+                        onsets, offs = part[:, 0], part[:, 1]
+                        rests = onsets - np.concatenate([[0], offs[:-1]])
+                        keys = np.full(2*len(part), Note.es.key())
+                        durations, dynamics = np.zeros(2*len(part)), np.zeros(2*len(part))
+                        keys[1::2], durations[0::2], durations[1::2] = part[:, 2], rests, offs - onsets
+                        dynamics[1::2] = part[:, 3] / 127
+                        keep = np.ones(2*len(part), dtype=bool)
+                        keep[0::2] = rests > 0
+                        voices.append(Note.array.bycolumns(keys[keep], durations[keep] / division, dynamics[keep]))
+                result = Note.array.poly(voices)
+                result.tempo = 120 if tempo is None else tempo
+                return result
 
-            def play(self, tempo=120, sample_rate=44100, fadein = 0.05, fadeout = 0.05, damp = 0):
-                audio = self.wave(tempo=tempo, sample_rate=sample_rate, fadein = fadein, fadeout = fadeout, damp = damp)
-                sd.play(audio, samplerate=44100)
-                sd.wait()
+            def to_midi(self, path, tempo = 120, division = 480):
+                #writes the voices to a standard midi file: a tempo track, then a track and a channel for every voice
+                #(the drum channel, 10, is skipped). rests are left out, and the timbres are not kept.
+                #dynamics are written as velocities, dynamic*127.
+                number_bytes = Note.array.poly.number_bytes
+                channels = [i for i in range(16) if i != 9]
+                tracks = [b"\x00\xff\x51\x03" + struct.pack(">I", round(60000000 / tempo))[1:] + b"\x00\xff\x2f\x00"]
+                for i in range(self.size):
+                    voice, channel = self[i], channels[i % len(channels)]
+                    ticks = np.round(np.concatenate([[0], np.cumsum(voice.durations)]) * division).astype(np.int64)
+                    sounding = np.flatnonzero((voice.dynamics != 0) & (ticks[1:] > ticks[:-1]))
+                    keys = voice.keys[sounding].astype(np.int64)
+                    if ((keys < 0) | (keys > 127)).any():
+                        raise Exception("the keys of the notes must be MIDI numbers (0-127) to be written to a midi file.")
+                    velocities = np.clip(np.round(voice.dynamics[sounding] * 127), 1, 127).astype(np.int64)
+                    #a note that ends on a tick is turned off before the next one starts on it
+                    events = sorted([(t, 0, 0x80 | channel, k, 0) for t, k in zip(ticks[sounding+1].tolist(), keys.tolist())] +
+                                    [(t, 1, 0x90 | channel, k, v) for t, k, v in zip(ticks[sounding].tolist(), keys.tolist(), velocities.tolist())])
+                    track, last = [], 0
+                    for tick, kind, status, key, velocity in events:
+                        track.append(number_bytes(tick - last) + bytes((status, key, velocity)))
+                        last = tick
+                    tracks.append(b"".join(track) + b"\x00\xff\x2f\x00")
+                with open(path, "wb") as file:
+                    file.write(b"MThd" + struct.pack(">IHHH", 6, 1, len(tracks), division))
+                    for track in tracks:
+                        file.write(b"MTrk" + struct.pack(">I", len(track)) + track)
+
+            def truncate(self, harmonics):
+                #returns the voices with only the first harmonics of their timbres
+                return Note.array.poly([i.truncate(harmonics) for i in self])
+
+            def preview(self, tempo=120, sample_rate=44100, fadein = 0.05, fadeout = 0.05, damp = 0, offsets = None, normalize = None,
+                        limit = None, preview_rate = 8000, harmonics = 3, dtype = np.float64, resample = True):
+                #a quick render of the mix for listening (see Note.array.preview).
+                #the events of wave() at sample_rate are moved to the closest samples of preview_rate, round(start*preview_rate/sample_rate),
+                #and every note keeps its own number of samples at preview_rate.
+                voices = self.truncate(harmonics)
+                rate = preview_rate if sample_rate is None else sample_rate
+                starts, lengths, voice_indexes, note_indexes = voices.events(tempo, rate, offsets)
+                total = int((starts + lengths).max()) if starts.size else 0
+                #the numbers of samples of the notes at preview_rate, voice after voice
+                samples = np.concatenate([np.zeros(0, dtype=np.int64)]+[i.samples(tempo, preview_rate) for i in voices])
+                firsts = np.cumsum([0]+[i.size for i in voices])
+                events = (np.round(starts * (preview_rate / rate)).astype(np.int64), samples[firsts[voice_indexes] + note_indexes],
+                          voice_indexes, note_indexes)
+                size = int((events[0] + events[1]).max()) if starts.size else 0
+                bus = voices.mix(np.zeros(size, dtype=dtype), 0, events, tempo=tempo, sample_rate=preview_rate, fadein=fadein,
+                                 fadeout=fadeout, damp=damp)
+                bus = Note.array.poly.master(bus, normalize, limit)
+                if not resample or rate == preview_rate:
+                    return bus
+                return Note.resample(bus, preview_rate, rate, total)
+
+            def play(self, tempo=120, sample_rate=44100, fadein = 0.05, fadeout = 0.05, damp = 0, stream = False, block_size = 1024, audio = None,
+                     preview = False, preview_rate = 8000, harmonics = 3):
+                #stream = True plays the voices block by block (see Note.stream)
+                #preview = True plays preview() (see Note.array.play)
+                if preview:
+                    audio = Note.backend(audio)
+                    native = Note.plays_at(audio, preview_rate)
+                    wave = self.preview(tempo, sample_rate=sample_rate, fadein=fadein, fadeout=fadeout, damp=damp,
+                                        preview_rate=preview_rate, harmonics=harmonics, resample=not native)
+                    audio.play(wave, samplerate=preview_rate if native else sample_rate)
+                    return audio.wait()
+                if stream:
+                    blocks = self.blocks(block_size, tempo=tempo, sample_rate=sample_rate, fadein=fadein, fadeout=fadeout, damp=damp)
+                    return Note.stream(blocks, sample_rate = sample_rate, block_size = block_size, audio = audio)
+                wave = self.wave(tempo=tempo, sample_rate=sample_rate, fadein = fadein, fadeout = fadeout, damp = damp)
+                audio = Note.backend(audio)
+                audio.play(wave, samplerate=sample_rate)
+                audio.wait()
+
+            def play_async(self, tempo=120, sample_rate=44100, fadein = 0.05, fadeout = 0.05, damp = 0, player = None, audio = None):
+                #plays the voices without waiting for them (see Note.array.play_async)
+                if player is None:
+                    player = Note.PlayQueue.default(sample_rate, audio)
+                elif player.sample_rate != sample_rate:
+                    raise Exception("'sample_rate' parameter must be the sample rate of the player.")
+                return player.put(self.blocks(player.block_size, tempo=tempo, sample_rate=sample_rate, fadein=fadein, fadeout=fadeout,
+                                              damp=damp))
+
+            def consonance_matrix(self):
+                #Note.array.consonance_matrix over the notes of all voices, voice after voice
+                return Note.array.join(self.list).consonance_matrix()
 
             def tone(self, aslist=True, probabilistic=False, probability_base=10, scales=0, hidden=0):
                 # returns a list of pairs that contain the possible tone of a given note array
@@ -666,53 +2456,16 @@ class Note:
                 # else, the duration of the notes will affect the result:
                 #   the longer a note ise, the higher the probability parameter of the tones it might belong well be.
                 #   the result is a list of tuples, sorted according to probability parameter. (tonal center, scale, probablity parameter)
-                if scales == 0:
-                    scales = Note.scales
-                result = []
-                if type(aslist) != bool:
-                    raise Exception("'aslist' parameter must be a boolean.")
-                if type(probabilistic) != bool:
-                    raise Exception("'probabilistic' parameter must be a boolean.")
-                if hidden == 1:
-                    space = ""
-                else:
-                    space = " "
-                for scale in list(scales.keys()):
-                    tone_values = 12 * [1]
-                    for j in self:
-                        for i in j:
-                            belongs = [(i - j).note_index() for j in scales[scale]]
-                            for k in range(len(tone_values)):
-                                if k not in belongs:
-                                    if probabilistic == False and i.dynamic != 0:
-                                        tone_values[k] = 0
-                                    else:
-                                        tone_values[k] *= probability_base ** (-i.duration*i.dynamic**0.25)
-                    if probabilistic == False:
-                        if 1 in tone_values:
-                            indexes = [item for item, x in enumerate(tone_values) if x == 1]
-                            if aslist == False:
-                                result = result + [(Note.sets[note] + space + scale) for note in indexes]
-                            else:
-                                result = result + [(Note.sets[note], scale) for note in indexes]
-                    else:
-                        if aslist == False:
-                            result.append([[Note.sets[i] + space + scale, tone_values[i]] for i in range(12)])
-                            x = 1
-                        else:
-                            result.append([(Note.sets[i], scale, tone_values[i]) for i in range(12)])
-                            x = 2
-                if probabilistic == True:
-                    results = []
-                    for i in result:
-                        for j in i:
-                            results.append(j)
-                    results = sorted(results, key=lambda k: k[x], reverse=True)
-                    normalize = [i[x] for i in results]
-                    normalize = sum(normalize)
-                    if aslist == True:
-                        result = [(i[0], i[1], i[2] / normalize) for i in results]
-                    else:
-                        result = [(i[0], i[1] / normalize) for i in results]
-                return result
+                mask, weights = 0, np.zeros(12)
+                for voice in self:
+                    voice_mask, voice_weights = voice.pitch_classes()
+                    mask |= voice_mask
+                    weights += voice_weights
+                return Note.array.match(mask, weights, aslist=aslist, probabilistic=probabilistic,
+                                        probability_base=probability_base, scales=scales, hidden=hidden)
+Note.names = tuple(Note.sets[i]+str(i//12 -1) for i in range(128)) #canonical names of the MIDI numbers
+Note.classes = tuple(i % 12 for i in range(128)) #pitch classes (indexes in Note.sets) of the MIDI numbers
+Note.frequencies = tuple(440*2**((i-69)/12) for i in range(128)) #frequencies of the MIDI numbers
+Note.harmonic_table += [round(12*np.log(n)/np.log(2)) for n in range(1, Note.harmonic_bound+1)]
+Note.subharmonic_offsets(Note.harmonic_bound)
 Note.es = Note("C0",dynamic = 0)
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from bach import Note
+
+
+def pieces(size=25):
+    rng = np.random.default_rng(9)
+    result = []
+    for i in range(size):
+        count = int(rng.integers(0, 12))
+        array = Note.array.bycolumns(rng.integers(48, 84, count), rng.choice([0.25, 0.5, 1], count), rng.choice([0, 0.3, 1], count))
+        if i % 4 == 0:
+            result.append(Note.array.poly([array, array.transpose(int(rng.integers(1, 7)))]))
+        else:
+            result.append(array)
+    return result
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    path = str(tmp_path / "pieces.bach")
+    Note.array.corpus.write(path, pieces())
+    return Note.array.corpus(path)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+@pytest.mark.parametrize("probabilistic", [False, True])
+def test_tones_are_tone_of_every_piece(corpus, workers, probabilistic):
+    expected = [piece.tone(probabilistic=probabilistic)[:3] for piece in pieces()]
+    for source in (pieces(), corpus):
+        result = Note.array.tones(source, probabilistic=probabilistic, workers=workers, chunk_size=4)
+        assert result["top"] == expected
+    result = Note.array.tones(pieces(), aslist=False, probabilistic=probabilistic, top=None, workers=workers, chunk_size=4)
+    assert result["top"] == [piece.tone(aslist=False, probabilistic=probabilistic) for piece in pieces()]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+@pytest.mark.parametrize("probabilistic", [False, True])
+def test_roots_are_root_of_every_piece(tmp_path, workers, probabilistic):
+    arrays = [piece for piece in pieces() if type(piece) == Note.array]
+    path = str(tmp_path / "arrays.bach")
+    Note.array.corpus.write(path, arrays)
+    expected = [array.root(probabilistic=probabilistic)[:3] for array in arrays]
+    for source in (arrays, Note.array.corpus(path)):
+        result = Note.array.roots(source, probabilistic=probabilistic, workers=workers, chunk_size=4)
+        assert result["top"] == expected
+
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from bach import Note
+
+
+def test_byfreq_rounds_to_the_closest_notes():
+    frequencies = [440, 261.63, 27.5, 4186.01, 450]
+    assert Note.keys_byfreq(frequencies).tolist() == [69, 60, 21, 108, 69]
+    assert Note.array.byfreq(frequencies).keys.tolist() == [Note.byfreq(i).key() for i in frequencies]
+
+
+def test_frames_without_a_pitch_are_rests():
+    array = Note.array.byfreq([440, 0, np.nan, -1, 261.63], durations=0.25, dynamics=0.5)
+    assert array.keys.tolist() == [69, Note.es.key(), Note.es.key(), Note.es.key(), 60]
+    assert array.dynamics.tolist() == [0.5, 0, 0, 0, 0.5]
+    assert array.durations.tolist() == [0.25]*5
+
+
+def test_invalid_frequencies_raise():
+    for frequency in (0, -1, float("nan")):
+        with pytest.raises(Exception, match="frequency"):
+            Note.byfreq(frequency)
+    with pytest.raises(Exception, match="frequencies"):
+        Note.keys_byfreq([440, 0])
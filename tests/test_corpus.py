@@ -0,0 +1,112 @@
+import os
+import struct
+
+import numpy as np
+import pytest
+
+from bach import Note
+
+
+def voice(rng, size):
+    return Note.array.bycolumns(rng.integers(40, 90, size), rng.choice([0.25, 0.5, 1], size), rng.choice([0, 0.3, 0.6], size),
+                                ([1], [1, 0.5], [1, 0.2, 0.1]), rng.integers(0, 3, size))
+
+
+def pieces():
+    rng = np.random.default_rng(7)
+    result = []
+    for i in range(30):
+        if i % 3:
+            result.append(voice(rng, int(rng.integers(0, 40))))
+        else:
+            result.append(Note.array.poly([voice(rng, 20), voice(rng, 30).transpose(2), voice(rng, 0)]))
+    result.append(Note.array([Note("A4", timbre=[1, 0, 0.3])]))
+    return result
+
+
+def columns(array):
+    return (array.keys.tolist(), array.durations.tolist(), array.dynamics.tolist(),
+            [tuple(array.timbres[i]) for i in array.timbre_index])
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    path = str(tmp_path / "pieces.bach")
+    written = pieces()
+    Note.array.corpus.write(path, written)
+    return written, Note.array.corpus(path)
+
+
+def test_round_trip(corpus):
+    written, read = corpus
+    assert len(read) == len(written)
+    for piece, back in zip(written, read):
+        assert type(back) == type(piece)
+        voices = piece.list if type(piece) == Note.array.poly else [piece]
+        backs = back.list if type(back) == Note.array.poly else [back]
+        assert [columns(i) for i in backs] == [columns(i) for i in voices]
+    assert np.array_equal(read[1].wave(sample_rate=4000), written[1].wave(sample_rate=4000))
+    assert read[0].tone() == written[0].tone()
+
+
+def test_layout(corpus):
+    written, read = corpus
+    voices = [v for piece in written for v in (piece.list if type(piece) == Note.array.poly else [piece])]
+    notes = sum(v.size for v in voices)
+    with open(read.path, "rb") as file:
+        header = file.read(64)
+    assert header[:8] == Note.array.corpus.magic
+    size, count, total, timbres, values = struct.unpack("<QQQQQ", header[8:48])
+    assert (size, count, total, timbres, values) == (len(written), len(voices), notes, 4, 9)
+    sections = Note.array.corpus.layout(size, count, total, timbres, values)
+    assert sections["durations"][0] == 64
+    assert os.path.getsize(read.path) == sections["polys"][1]
+    assert read.polys.tolist() == [1 if type(piece) == Note.array.poly else 0 for piece in written]
+    assert read.voice_offsets.tolist() == np.cumsum([0] + [v.size for v in voices]).tolist()
+    #the timbre table is shared by all the pieces
+    assert read.timbres == [[1.0], [1.0, 0.5], [1.0, 0.2, 0.1], [1.0, 0.0, 0.3]]
+
+
+def test_indexing(corpus):
+    written, read = corpus
+    assert columns(read[-1]) == columns(written[-1])
+    assert [type(i) for i in read[1:4]] == [type(i) for i in written[1:4]]
+    assert columns(read.voice(1)) == columns(written[0].list[1])
+    with pytest.raises(IndexError):
+        read[len(written)]
+    with pytest.raises(TypeError):
+        read["0"]
+
+
+def test_pieces_are_copied_on_write(corpus):
+    written, read = corpus
+    piece = read[1]
+    piece[0] = Note("C4")
+    assert piece[0].name == "C4"
+    assert columns(read[1]) == columns(written[1])
+
+
+def test_pitch_classes(corpus):
+    written, read = corpus
+    masks, weights = read.pitch_classes()
+    expected = Note.array.piece_classes(written)
+    assert masks.tolist() == expected[0].tolist()
+    assert np.allclose(weights, expected[1])
+    masks, weights = read.pitch_classes(3, 10)
+    assert masks.tolist() == expected[0][3:10].tolist()
+
+
+def test_empty_corpus(tmp_path):
+    path = str(tmp_path / "empty.bach")
+    Note.array.corpus.write(path, [])
+    assert len(Note.array.corpus(path)) == 0
+
+
+def test_bad_pieces(tmp_path):
+    with pytest.raises(Exception, match="pieces"):
+        Note.array.corpus.write(str(tmp_path / "bad.bach"), [Note("C4")])
+    path = str(tmp_path / "other.bach")
+    with open(path, "wb") as file:
+        file.write(bytes(64))
+    with pytest.raises(Exception, match="corpus file"):
+        Note.array.corpus(path)
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from bach import Note
+
+
+def melodies(seed, count):
+    rng = np.random.default_rng(seed)
+    result = []
+    for i in range(count):
+        size = int(rng.integers(0, 30))
+        #few different intervals, so that motifs are found often
+        keys = 60 + np.cumsum(rng.choice([-2, -1, 1, 2], size))
+        result.append(Note.array.bycolumns(keys, 0.5, rng.choice([0, 0.5, 0.5, 0.5], size)))
+    return result
+
+
+def scan(melodies, motif, mismatches):
+    #the places of the motif, found by comparing it with the intervals at every note of every melody
+    motif = np.diff(motif.keys[motif.dynamics != 0].astype(np.int64))
+    found = []
+    for number, melody in enumerate(melodies):
+        sounding = np.flatnonzero(melody.dynamics != 0)
+        intervals = np.diff(melody.keys[sounding].astype(np.int64))
+        for start in range(intervals.size - motif.size + 1):
+            if (intervals[start:start+motif.size] != motif).sum() <= mismatches:
+                found.append((number, int(sounding[start])))
+    return found
+
+
+def motifs(melodies, seed):
+    rng = np.random.default_rng(seed)
+    result = []
+    for length in range(2, 10):
+        melody = melodies[int(rng.integers(0, len(melodies)))]
+        sounding = Note.array.bycolumns(melody.keys[melody.dynamics != 0], 0.5, 0.5)
+        if sounding.size >= length:
+            start = int(rng.integers(0, sounding.size - length + 1))
+            result.append(sounding[start:start+length].transpose(int(rng.integers(-5, 6))))
+    #the end of a melody followed by the start of the next one
+    for first, second in zip(melodies[:-1], melodies[1:]):
+        if first.size >= 3 and second.size >= 3:
+            result.append(Note.array.join([first[-3:], second[:3]]))
+    return result
+
+
+@pytest.mark.parametrize("n", [1, 3, 4])
+def test_find_is_a_scan(n):
+    songs = melodies(n, 40)
+    index = Note.array.index(n=n)
+    for song in songs:
+        index.add(song)
+    for motif in motifs(songs, n):
+        for mismatches in range(3):
+            assert sorted(index.find(motif, mismatches)) == scan(songs, motif, mismatches)
+
+
+def test_adding_between_searches():
+    songs = melodies(5, 30)
+    index = Note.array.index(n=4)
+    for count, song in enumerate(songs, 1):
+        assert index.add(song) == count - 1
+        if count % 5 == 0:
+            for motif in motifs(songs[:count], count):
+                for mismatches in range(3):
+                    assert sorted(index.find(motif, mismatches)) == scan(songs[:count], motif, mismatches)
+
+
+def test_bad_motifs():
+    index = Note.array.index()
+    index.add(melodies(1, 1)[0])
+    with pytest.raises(Exception, match="motif"):
+        index.find(Note.array([Note("C4")]))
+    with pytest.raises(Exception, match="mismatches"):
+        index.find(Note.array([Note("C4"), Note("D4")]), mismatches=-1)
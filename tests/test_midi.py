@@ -0,0 +1,105 @@
+import struct
+
+import numpy as np
+import pytest
+
+from bach import Note
+
+
+def onsets(voice):
+    return np.concatenate([[0], np.cumsum(voice.durations)])[:-1]
+
+
+def midi(events, format=0, division=480):
+    #a midi file of one track with the given event bytes
+    events += b"\x00\xff\x2f\x00"
+    return b"MThd" + struct.pack(">IHHH", 6, format, 1, division) + b"MTrk" + struct.pack(">I", len(events)) + events
+
+
+def ticks(value):
+    return Note.array.poly.number_bytes(value)
+
+
+def test_number_bytes_round_trip():
+    for value in (0, 1, 127, 128, 480, 16383, 16384, 0x0FFFFFFF):
+        data = Note.array.poly.number_bytes(value)
+        assert Note.array.poly.read_number(data + b"\x00", 0) == (value, len(data))
+
+
+def test_round_trip(tmp_path):
+    rng = np.random.default_rng(5)
+    first = Note.array.bycolumns(rng.integers(40, 90, 50), rng.choice([0.25, 0.5, 1, 1.5], 50), rng.choice([0.2, 0.5, 1.0], 50))
+    second = Note.array.bycolumns([60, 62, 64], [1, 0.5, 0.5], 0.5)
+    path = str(tmp_path / "round.mid")
+    Note.array.poly([first, second]).to_midi(path, tempo=90)
+    back = Note.array.poly.bymidi(path)
+    assert back.tempo == pytest.approx(90)
+    assert len(back) == 2
+    for voice, read in zip([first, second], back):
+        assert (read.keys == voice.keys).all()
+        assert np.allclose(read.durations, voice.durations)
+        assert np.abs(read.dynamics - voice.dynamics).max() <= 0.5/127 + 1e-9
+
+
+def test_rests_are_kept_as_dynamic_0(tmp_path):
+    voice = Note.array([Note("C4"), Note.es, Note("E4", duration=0.5), Note("G4", duration=0.5, dynamic=0)])
+    path = str(tmp_path / "rests.mid")
+    voice.to_midi(path)
+    read = Note.array.poly.bymidi(path)[0]
+    assert read.keys.tolist() == [60, Note.es.key(), 64]
+    assert read.durations.tolist() == [1, 1, 0.5]
+    assert read.dynamics[1] == 0 and (read.dynamics[[0, 2]] > 0).all()
+
+
+def test_running_status():
+    #the second note on and the note offs have no status byte
+    data = midi(b"\x00\x90\x3c\x40" + ticks(480) + b"\x3c\x00" + b"\x00\x3e\x40" + ticks(240) + b"\x3e\x00")
+    voice = Note.array.poly.bymidi(data)[0]
+    assert voice.keys.tolist() == [60, 62]
+    assert voice.durations.tolist() == [1, 0.5]
+    assert np.allclose(voice.dynamics, 0x40 / 127)
+    assert Note.array.poly.bymidi(data).tempo == 120
+
+
+def test_overlapping_notes_go_to_extra_voices():
+    #a chord of two notes, then a note that starts while the upper one is still on
+    data = midi(b"\x00\x90\x3c\x40" + b"\x00\x90\x40\x40" + ticks(480) + b"\x80\x3c\x00" + b"\x00\x90\x43\x40"
+                + ticks(240) + b"\x80\x40\x00" + ticks(240) + b"\x80\x43\x00")
+    voices = Note.array.poly.bymidi(data)
+    assert len(voices) == 2
+    assert voices[0].keys.tolist() == [60, 67]
+    assert voices[0].durations.tolist() == [1, 1]
+    assert voices[1].keys.tolist() == [64]
+    assert voices[1].durations.tolist() == [1.5]
+
+
+def test_by_channel():
+    #one track with a note on channel 1 and a later note on channel 2, skipping sysex and text events
+    data = midi(b"\x00\xf0\x03\x01\x02\xf7" + b"\x00\xff\x01\x02hi" + b"\x00\x90\x3c\x40" + ticks(480) + b"\x80\x3c\x00"
+                + b"\x00\x91\x30\x7f" + ticks(480) + b"\x81\x30\x00")
+    tracks = Note.array.poly.bymidi(data, by="track")
+    assert len(tracks) == 1
+    assert tracks[0].keys.tolist() == [60, 48]
+    channels = Note.array.poly.bymidi(data, by="channel")
+    assert len(channels) == 2
+    assert channels[0].keys.tolist() == [60]
+    assert channels[1].keys.tolist() == [Note.es.key(), 48]
+    assert channels[1].durations.tolist() == [1, 1]
+    assert channels[1].dynamics.tolist() == [0, 1]
+
+
+def test_empty_poly(tmp_path):
+    path = str(tmp_path / "empty.mid")
+    Note.array.poly([]).to_midi(path, tempo=100)
+    read = Note.array.poly.bymidi(path)
+    assert len(read) == 0
+    assert read.tempo == pytest.approx(100)
+
+
+def test_bad_files(tmp_path):
+    with pytest.raises(Exception, match="by"):
+        Note.array.poly.bymidi(midi(b""), by="voice")
+    with pytest.raises(Exception, match="standard midi file"):
+        Note.array.poly.bymidi(b"RIFF" + bytes(20))
+    with pytest.raises(Exception, match="MIDI numbers"):
+        Note.array.bycolumns([200], 1, 0.5).to_midi(str(tmp_path / "bad.mid"))
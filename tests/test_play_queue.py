@@ -0,0 +1,91 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from bach import Note
+
+
+def notes():
+    return Note.array.bycolumns([60, 62, 64, 65], [0.5, 0.25, 0.75, 0.5], 0.4)
+
+
+def test_queued_arrays_play_one_after_another():
+    audio = Note.FakeAudio()
+    player = Note.PlayQueue(sample_rate=8000, block_size=256, audio=audio)
+    first, second = notes(), notes().transpose(7)
+    handles = [first.play_async(sample_rate=8000, player=player), second.play_async(sample_rate=8000, player=player)]
+    player.wait()
+    assert all(handle.done() for handle in handles)
+    wave = np.concatenate([first.wave(sample_rate=8000), second.wave(sample_rate=8000)])
+    assert np.allclose(audio.samples(), wave, atol=1e-6)
+
+
+def test_poly_and_note_are_queued_too():
+    audio = Note.FakeAudio()
+    player = Note.PlayQueue(sample_rate=8000, block_size=256, audio=audio)
+    poly = Note.array.poly([notes(), notes()[::-1]])
+    note = Note("A4", duration=0.3)
+    poly.play_async(sample_rate=8000, player=player)
+    note.play_async(sample_rate=8000, player=player)
+    player.wait()
+    wave = np.concatenate([poly.wave(sample_rate=8000), note.wave(sample_rate=8000)])
+    assert np.allclose(audio.samples(), wave, atol=1e-6)
+
+
+def test_cancel_finishes_the_handle():
+    audio = Note.FakeAudio()
+    player = Note.PlayQueue(sample_rate=8000, block_size=256, audio=audio)
+    first, long = notes(), 20*notes()
+    handles = [first.play_async(sample_rate=8000, player=player), long.play_async(sample_rate=8000, player=player)]
+    handles[1].cancel()
+    assert handles[1].wait(10)
+    player.wait()
+    assert handles[0].done() and handles[1].done()
+    assert audio.samples().size < long.wave(sample_rate=8000).size
+    assert np.allclose(audio.samples()[:first.wave(sample_rate=8000).size], first.wave(sample_rate=8000), atol=1e-6)
+
+
+def test_handle_can_be_awaited():
+    player = Note.PlayQueue(sample_rate=8000, block_size=256, audio=Note.FakeAudio())
+    async def play():
+        handle = notes().play_async(sample_rate=8000, player=player)
+        await asyncio.wait_for(handle, 10)
+        return handle.done()
+    assert asyncio.run(play())
+
+
+def test_sample_rate_must_match_the_player():
+    player = Note.PlayQueue(sample_rate=8000, audio=Note.FakeAudio())
+    with pytest.raises(Exception, match="sample_rate"):
+        notes().play_async(sample_rate=44100, player=player)
+
+
+def test_an_item_that_fails_does_not_stop_the_queue():
+    audio = Note.FakeAudio()
+    player = Note.PlayQueue(sample_rate=8000, block_size=256, audio=audio)
+    bad = Note.array([Note("C4", timbre=["x"])])
+    note = Note("D4", duration=0.5)
+    failed = bad.play_async(sample_rate=8000, player=player)
+    played = note.play_async(sample_rate=8000, player=player)
+    assert played.wait(10)
+    with pytest.raises(ValueError):
+        failed.wait(10)
+    assert np.allclose(audio.samples(), note.wave(sample_rate=8000), atol=1e-6)
+    async def play():
+        await asyncio.wait_for(bad.play_async(sample_rate=8000, player=player), 10)
+    with pytest.raises(ValueError):
+        asyncio.run(play())
+
+
+def test_realtime_queue_plays_silence_while_an_item_is_rendered():
+    class RealtimeAudio(Note.FakeAudio):
+        realtime = True
+    audio = RealtimeAudio()
+    player = Note.PlayQueue(sample_rate=8000, block_size=256, audio=audio)
+    array = notes()
+    player.put(array.blocks(256, sample_rate=8000))
+    player.wait(10)
+    #the blocks of the stream are the blocks of the item, or silence when the next one was not rendered in time
+    sound = [block for block in audio.written if block.any()]
+    assert np.allclose(np.concatenate(sound), array.wave(sample_rate=8000), atol=1e-6)
@@ -0,0 +1,39 @@
+import numpy as np
+
+from bach import Note
+
+
+def late_note():
+    #1800 triplet rests (5 minutes at 120 bpm), then a note
+    return Note.array.bycolumns([Note.es.key()]*1800 + [60], [1/3]*1800 + [1], [0]*1800 + [0.5])
+
+
+def first_sound(wave):
+    return int(np.flatnonzero(wave)[0])
+
+
+def test_preview_onsets_follow_the_full_render():
+    array = late_note()
+    start = int(array.onsets(120, 44100)[0][-1])
+    assert first_sound(array.wave()) == start + 1
+    assert first_sound(array.preview(resample=False)) == round(start * 8000 / 44100) + 1
+    assert abs(first_sound(array.preview()) - start) <= 44100 // 8000 + 1
+    assert array.preview().size == array.wave().size
+
+
+def test_preview_of_poly_onsets_follow_the_full_render():
+    poly = Note.array.poly([late_note(), Note.array.bycolumns([64], [1], [0.5])])
+    offsets = [0, 10]
+    starts, lengths, voices, indexes = poly.events(120, 44100, offsets)
+    early, late = int(starts[voices == 1][0]), int(starts[indexes == 1800][0])
+    preview = poly.preview(offsets=offsets, resample=False)
+    assert first_sound(preview) == round(early * 8000 / 44100) + 1
+    later = 6 * 8000
+    assert first_sound(preview[later:]) + later == round(late * 8000 / 44100) + 1
+    assert poly.preview(offsets=offsets).size == poly.wave(offsets=offsets).size
+
+
+def test_preview_at_its_own_rate_is_the_wave_at_that_rate():
+    array = Note.array.bycolumns([60, 64, 67, 72], [0.5, 1/3, 1/3, 1], 0.4, ([1, 0.5, 0.3, 0.2, 0.1],))
+    assert np.allclose(array.preview(sample_rate=None), array.truncate(3).wave(sample_rate=8000))
+    assert np.allclose(array.preview(sample_rate=8000), array.truncate(3).wave(sample_rate=8000))
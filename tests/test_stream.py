@@ -0,0 +1,113 @@
+import time
+
+import numpy as np
+import pytest
+
+from bach import Note
+
+
+def notes():
+    return Note.array.bycolumns([60, 64, 67, 72], [0.5, 0.25, 0.75, 0.5], 0.3, ([1, 0.5, 0.3],))
+
+
+def test_stream_plays_the_wave():
+    array = notes()
+    audio = Note.FakeAudio()
+    array.play(stream=True, audio=audio)
+    wave = array.wave()
+    assert wave.size % 1024 != 0
+    assert np.allclose(audio.samples(), wave, atol=1e-6)
+
+
+def test_stream_of_poly_plays_the_wave():
+    poly = Note.array.poly([notes(), notes() - 12])
+    audio = Note.FakeAudio()
+    poly.play(stream=True, block_size=512, audio=audio)
+    assert np.allclose(audio.samples(), poly.wave(), atol=1e-6)
+
+
+def test_stream_takes_blocks_of_any_size():
+    wave = np.linspace(-1, 1, 5000)
+    blocks = [wave[:300], wave[300:300], wave[300:2348], wave[2348:]]
+    audio = Note.FakeAudio()
+    Note.stream(blocks, block_size=1024, audio=audio)
+    assert np.allclose(audio.samples(), wave, atol=1e-6)
+
+
+def test_stream_of_whole_blocks():
+    wave = np.linspace(-1, 1, 2048)
+    audio = Note.FakeAudio()
+    Note.stream([wave[:1024], wave[1024:]], block_size=1024, audio=audio)
+    assert audio.samples().size == 2048
+
+
+def test_stream_start_keeps_the_sound_of_the_last_block():
+    audio = Note.FakeAudio()
+    calls = []
+    def callback(outdata, frames, time, status):
+        calls.append(frames)
+        outdata[:] = 0.5
+        if len(calls) == 2:
+            raise audio.CallbackStop(100)
+    finished = []
+    stream = audio.OutputStream(samplerate=44100, blocksize=256, channels=1, callback=callback,
+                                finished_callback=lambda: finished.append(True))
+    stream.start()
+    assert calls == [256, 256]
+    assert [block.size for block in audio.written] == [256, 100]
+    assert finished == [True]
+
+
+def test_stream_to_file(tmp_path):
+    array = notes()
+    path = str(tmp_path / "stream.wav")
+    array.play(stream=True, audio=Note.FileAudio(path, "float32"))
+    with open(path, "rb") as file:
+        data = file.read()
+    wave = array.wave()
+    assert len(data) == 44 + 4 * wave.size
+    assert np.allclose(np.frombuffer(data[44:], dtype="<f4"), wave, atol=1e-6)
+
+
+def test_file_audio_keeps_everything_played(tmp_path):
+    array = notes()
+    path = str(tmp_path / "session.wav")
+    audio = Note.FileAudio(path)
+    array.play(audio=audio)
+    array.play(stream=True, audio=audio)
+    with open(path, "rb") as file:
+        data = file.read()
+    assert data[:44] == Note.wav_header(2 * array.wave().size, 44100, "int16")
+    assert len(data) == 44 + 4 * array.wave().size
+    audio.close()
+    array.play(audio=audio)
+    audio.close()
+    with open(path, "rb") as file:
+        data = file.read()
+    assert data[:44] == Note.wav_header(3 * array.wave().size, 44100, "int16")
+    assert len(data) == 44 + 6 * array.wave().size
+
+
+def test_stream_raises_what_rendering_raises():
+    def blocks():
+        yield np.ones(1024)
+        raise ValueError("bad block")
+    audio = Note.FakeAudio()
+    with pytest.raises(ValueError, match="bad block"):
+        Note.stream(blocks(), audio=audio)
+    assert audio.samples().size == 1024
+
+
+def test_realtime_stream_plays_silence_when_a_block_is_late():
+    class RealtimeAudio(Note.FakeAudio):
+        realtime = True
+    wave = np.linspace(1, 2, 4096)
+    def blocks():
+        for i in range(0, wave.size, 1024):
+            time.sleep(0.01)
+            yield wave[i:i+1024]
+    audio = RealtimeAudio()
+    Note.stream(blocks(), block_size=1024, audio=audio)
+    sound = [block for block in audio.written if block.any()]
+    assert len(audio.written) > len(sound)
+    assert np.allclose(np.concatenate(sound), wave, atol=1e-6)
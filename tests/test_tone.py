@@ -0,0 +1,83 @@
+import pytest
+
+from bach import Note
+
+#values given by the code before tone(), root(), chord() and add() were rewritten
+
+PIECES = {
+    'melody': [('C4', 1, 0.25), ('E4', 0.5, 0.25), ('G4', 0.5, 0.5), ('B4', 1, 0.25), ('D5', 0.5, 0.25)],
+    'rests': [('A3', 1, 0.25), ('C4', 1, 0), ('E4', 0.5, 0.25), ('F#4', 0.5, 0), ('G4', 2, 1)],
+    'maj9': [('C4', 1, 0.25), ('E4', 1, 0.25), ('G4', 1, 0.25), ('Bb4', 1, 0.25), ('D5', 1, 0.25)],
+}
+
+TONES = {
+    'melody': ([('C', 'major'), ('G', 'major')],
+        []),
+    'rests': ([('C', 'major'), ('D', 'major'), ('F', 'major'), ('G', 'major'), ('D', 'harmonic minor'), ('E', 'harmonic minor'), ('D', 'melodic minor'), ('E', 'melodic minor'), ('G', 'melodic minor')],
+        [('A', 'Maj7'), ('A', 'm7'), ('A', 'Maj9'), ('A', '7')]),
+    'maj9': ([('F', 'major'), ('F', 'melodic minor'), ('G', 'melodic minor')],
+        [('C', 'Maj9')]),
+}
+
+PROBABILITIES = {
+    'melody': ([('C', 'major', 0.156710707396), ('G', 'major', 0.156710707396), ('C', 'harmonic minor', 0.069429698678), ('E', 'harmonic minor', 0.069429698678), ('C', 'melodic minor', 0.069429698678), ('A', 'harmonic minor', 0.059518292502)],
+        [('E', 'm7', 0.013541177836), ('C', 'mMaj7', 0.013541177836), ('C', 'Maj9', 0.013541177836), ('C', 'maug7', 0.013541177836), ('C', 'Maj', 0.010598057368), ('G', 'Maj', 0.010598057368)]),
+    'rests': ([('C', 'major', 0.083487501463), ('D', 'major', 0.083487501463), ('F', 'major', 0.083487501463), ('G', 'major', 0.083487501463), ('D', 'harmonic minor', 0.083487501463), ('E', 'harmonic minor', 0.083487501463)],
+        [('A', 'Maj7', 0.023545868104), ('A', 'm7', 0.023545868104), ('A', 'Maj9', 0.023545868104), ('A', '7', 0.023545868104), ('F', 'Maj9', 0.018428268499), ('G', 'Maj9', 0.018428268499)]),
+    'maj9': ([('F', 'major', 0.194687963164), ('F', 'melodic minor', 0.194687963164), ('G', 'melodic minor', 0.194687963164), ('C', 'major', 0.038214864176), ('Eb', 'major', 0.038214864176), ('G', 'major', 0.038214864176)],
+        [('C', 'Maj9', 0.033127539589), ('C', 'Maj7', 0.02029218581), ('C', '7', 0.02029218581), ('E', 'dim7', 0.02029218581), ('G', 'mM7', 0.02029218581), ('C', 'Maj', 0.012429924167)]),
+}
+
+CHORDS = {
+    'C4': ['C-1', 'C-1', 'E-1', 'G-1', 'C0', 'C0', 'E0', 'G0', 'C1', 'C1', 'E1', 'G1', 'C2', 'C2', 'E2', 'G2', 'C3', 'C3', 'E3', 'G3', 'C4', 'E4', 'G4', 'C5', 'E5', 'G5', 'C6', 'E6', 'G6', 'C7', 'E7', 'G7', 'C8', 'E8', 'G8', 'C9', 'E9', 'G9', 'C10', 'E10', 'G10'],
+    'E4 in C4': ['C-1', 'E-1', 'G-1', 'C0', 'C0', 'E0', 'G0', 'C1', 'C1', 'E1', 'G1', 'C2', 'C2', 'E2', 'G2', 'C3', 'C3', 'E3', 'G3', 'C4', 'E4', 'G4', 'C5', 'E5', 'G5', 'C6', 'E6', 'G6', 'C7', 'E7', 'G7', 'C8', 'E8', 'G8', 'C9', 'E9', 'G9', 'C10', 'E10', 'G10', 'C11'],
+    'D4 9': ['C1', 'E1', 'D1', 'D1', 'F#1', 'A1', 'C2', 'E2', 'D2', 'D2', 'F#2', 'A2', 'C3', 'E3', 'D3', 'D3', 'F#3', 'A3', 'C4', 'E4', 'D4', 'F#4', 'A4', 'C5', 'E5', 'D5', 'F#5', 'A5', 'C6', 'E6', 'D6', 'F#6', 'A6', 'C7', 'E7', 'D7', 'F#7', 'A7', 'C8', 'E8', 'D8'],
+}
+
+ADDS = {
+    ('C', 'major', ('C4', 'E4', 'G4', 'B4', 'D5')): [[48, 50, 53, 57, 60], [48, 52, 55, 59, 62], [50, 53, 57, 60, 64], [52, 55, 59, 60, 65], [53, 57, 60, 62, 67], [55, 59, 60, 64, 69], [57, 60, 62, 65, 71], [59, 60, 64, 67, 72], [60, 62, 65, 69, 72], [60, 64, 67, 71, 74], [62, 65, 69, 72, 76], [64, 67, 71, 72, 77], [65, 69, 72, 74, 79], [67, 71, 72, 76, 81], [69, 72, 74, 77, 83], [71, 72, 76, 79, 84], [72, 74, 77, 81, 84], [72, 76, 79, 83, 86], [74, 77, 81, 84, 88]],
+    ('A', 'harmonic minor', ('A3', 'G#4', 'F4', 'B4', 'C5')): [[45, 53, 52, 57, 59], [45, 56, 53, 59, 60], [47, 57, 56, 60, 62], [48, 57, 57, 62, 64], [50, 59, 57, 64, 65], [52, 60, 59, 65, 68], [53, 62, 60, 68, 69], [56, 64, 62, 69, 69], [57, 65, 64, 69, 71], [57, 68, 65, 71, 72], [59, 69, 68, 72, 74], [60, 69, 69, 74, 76], [62, 71, 69, 76, 77], [64, 72, 71, 77, 80], [65, 74, 72, 80, 81], [68, 76, 74, 81, 81], [69, 77, 76, 81, 83], [69, 80, 77, 83, 84], [71, 81, 80, 84, 86]],
+    ('D', 'melodic minor', ('D4', 'C#5', 'B3', 'F4', 'A4')): [[50, 59, 45, 52, 55], [50, 61, 47, 53, 57], [52, 62, 49, 55, 59], [53, 62, 50, 57, 61], [55, 64, 50, 59, 62], [57, 65, 52, 61, 62], [59, 67, 53, 62, 64], [61, 69, 55, 62, 65], [62, 71, 57, 64, 67], [62, 73, 59, 65, 69], [64, 74, 61, 67, 71], [65, 74, 62, 69, 73], [67, 76, 62, 71, 74], [69, 77, 64, 73, 74], [71, 79, 65, 74, 76], [73, 81, 67, 74, 77], [74, 83, 69, 76, 79], [74, 85, 71, 77, 81], [76, 86, 73, 79, 83]],
+}
+
+
+def array(name):
+    return Note.array([Note(note, duration=duration, dynamic=dynamic) for note, duration, dynamic in PIECES[name]])
+
+
+@pytest.mark.parametrize("name", sorted(PIECES))
+def test_tone_and_root(name):
+    tones, roots = TONES[name]
+    assert array(name).tone() == tones
+    assert array(name).root() == roots
+    assert array(name).tone(aslist=False) == [tonic + " " + scale for tonic, scale in tones]
+    assert array(name).root(aslist=False) == [tonic + chord for tonic, chord in roots]
+
+
+@pytest.mark.parametrize("name", sorted(PIECES))
+def test_probabilistic_tone_and_root(name):
+    for result, expected in zip((array(name).tone(probabilistic=True)[:6], array(name).root(probabilistic=True)[:6]),
+                                PROBABILITIES[name]):
+        assert [i[:2] for i in result] == [i[:2] for i in expected]
+        assert [i[2] for i in result] == pytest.approx([i[2] for i in expected], rel=1e-9)
+
+
+def test_poly_tone_adds_up_the_voices():
+    poly = Note.array.poly([array("melody"), array("rests")])
+    joined = Note.array.join([array("melody"), array("rests")])
+    assert poly.tone() == joined.tone()
+    assert [i[:2] for i in poly.tone(probabilistic=True)] == [i[:2] for i in joined.tone(probabilistic=True)]
+
+
+def test_chord():
+    assert [Note("C4").chord(degree).name for degree in range(-20, 21)] == CHORDS["C4"]
+    assert [Note("E4").chord(degree, root="C4").name for degree in range(-20, 21)] == CHORDS["E4 in C4"]
+    assert [Note("D4").chord(degree, intervals=(0, 4, 7, 10, 14)).name for degree in range(-20, 21)] == CHORDS["D4 9"]
+
+
+def test_array_add():
+    for (tone, scale, names), expected in ADDS.items():
+        notes = Note.array([Note(name) for name in names])
+        assert [notes.add(add, tone=tone, scale=scale).keys.tolist() for add in range(-9, 10)] == expected
+    with pytest.raises(Exception, match="chord"):
+        Note.array([Note("G4")]).add(1, tone="A", scale="harmonic minor")
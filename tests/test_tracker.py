@@ -0,0 +1,28 @@
+import numpy as np
+
+from bach import Note
+
+
+def melody(seed, size):
+    rng = np.random.default_rng(seed)
+    return Note.array.bycolumns(rng.integers(48, 84, size), rng.choice([0.25, 0.5, 0.75, 1], size), rng.choice([0, 0.3, 0.5, 1], size))
+
+
+def test_track_is_tone_and_root_of_the_window():
+    for seed, window in ((1, 8), (2, 5), (3, 12)):
+        array = melody(seed, 120)
+        steps = array.track(window=window, top=3)
+        assert len(steps) == array.size
+        for i, (tones, chords) in enumerate(steps):
+            notes = array[max(0, i-window+1):i+1]
+            assert tones == notes.tone(probabilistic=True)[:3]
+            assert chords == notes.root(probabilistic=True)[:3]
+
+
+def test_push_takes_notes():
+    array = melody(4, 20)
+    tracker = Note.array.tracker(window=4, top=2)
+    for i in range(array.size):
+        tones, chords = tracker.push(array[i])
+    assert tones == array[-4:].tone(probabilistic=True)[:2]
+    assert chords == array[-4:].root(probabilistic=True)[:2]
@@ -0,0 +1,33 @@
+import numpy as np
+
+from bach import Note
+
+
+def notes(size=200):
+    rng = np.random.default_rng(3)
+    return Note.array.bycolumns(rng.integers(40, 90, size), rng.choice([0.25, 0.5, 1], size), rng.choice([0, 0.3, 0.6], size))
+
+
+def copy(array):
+    return Note.array.bycolumns(array.keys, array.durations, array.dynamics)
+
+
+def test_slices_read_only_their_notes():
+    array = notes()
+    for view in (array[10:18], array[::-1][5:12], array.transpose(3)[190:200], (3*array)[195:210]):
+        duration, tone, signature = view.duration(), view.tone(probabilistic=True), view.signature()
+        expected = copy(view)
+        assert duration == expected.duration()
+        assert tone == expected.tone(probabilistic=True)
+        assert signature == expected.signature()
+
+
+def test_repetitions_are_counted_on_the_base():
+    array = notes()
+    for view in (3*array, array[::-1], (2*array)[::-1].transpose(2)):
+        assert view.signature()[0] == "view"
+        assert view.duration() == copy(view).duration()
+        mask, weights = view.pitch_classes()
+        expected = copy(view).pitch_classes()
+        assert mask == expected[0]
+        assert np.allclose(weights, expected[1])
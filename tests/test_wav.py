@@ -0,0 +1,95 @@
+import struct
+import wave
+
+import numpy as np
+import pytest
+
+from bach import Note
+
+
+def notes():
+    #6003 samples at 8001 Hz, an odd number
+    return Note.array.bycolumns([60, 67, 64], 0.5, [0.9, 0.5, 0.7], ([1, 0.5, 0.3],))
+
+
+def read(path):
+    with open(path, "rb") as file:
+        return file.read()
+
+
+def test_int16_reads_back_with_the_wave_module(tmp_path):
+    array = notes()
+    path = str(tmp_path / "int16.wav")
+    array.to_wav(path, sample_rate=8001, block_size=1000)
+    samples = array.wave(sample_rate=8001)
+    with wave.open(path, "rb") as file:
+        assert (file.getnchannels(), file.getsampwidth(), file.getframerate()) == (1, 2, 8001)
+        assert file.getnframes() == samples.size
+        frames = np.frombuffer(file.readframes(file.getnframes()), dtype="<i2")
+    assert np.array_equal(frames, np.round(np.clip(samples, -1, 1)*32767).astype(np.int16))
+
+
+def test_int24_is_padded_to_an_even_size(tmp_path):
+    array = notes()
+    path = str(tmp_path / "int24.wav")
+    array.to_wav(path, sample_rate=8001, sample_format="int24", block_size=1000)
+    samples = array.wave(sample_rate=8001)
+    data = read(path)
+    assert samples.size % 2 == 1
+    assert len(data) == 44 + 3*samples.size + 1
+    assert struct.unpack("<I", data[4:8])[0] == len(data) - 8
+    assert struct.unpack("<I", data[40:44])[0] == 3*samples.size
+    with wave.open(path, "rb") as file:
+        assert file.getsampwidth() == 3 and file.getnframes() == samples.size
+    raw = np.frombuffer(data[44:44+3*samples.size], dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+    decoded = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+    decoded = np.where(decoded >= 1 << 23, decoded - (1 << 24), decoded)
+    assert np.array_equal(decoded, np.round(np.clip(samples, -1, 1)*8388607).astype(np.int32))
+
+
+def test_float32(tmp_path):
+    poly = Note.array.poly([notes(), notes().transpose(4)])
+    path = str(tmp_path / "float32.wav")
+    poly.to_wav(path, sample_rate=8001, sample_format="float32", block_size=1000)
+    data = read(path)
+    assert struct.unpack("<H", data[20:22])[0] == 3
+    assert np.array_equal(np.frombuffer(data[44:], dtype="<f4"), poly.wave(sample_rate=8001).astype(np.float32))
+
+
+@pytest.mark.parametrize("sample_format", ["int16", "int24", "float32"])
+def test_memmap_writes_the_same_file(tmp_path, sample_format):
+    poly = Note.array.poly([notes(), notes()[::-1]])
+    poly.to_wav(str(tmp_path / "plain.wav"), sample_rate=8001, sample_format=sample_format, block_size=1000)
+    poly.to_wav(str(tmp_path / "memmap.wav"), sample_rate=8001, sample_format=sample_format, block_size=1000, memmap=True)
+    assert read(str(tmp_path / "memmap.wav")) == read(str(tmp_path / "plain.wav"))
+
+
+def test_pcm_is_the_data_of_the_wav(tmp_path):
+    array = notes()
+    array.to_wav(str(tmp_path / "notes.wav"), sample_rate=8001, sample_format="int24")
+    array.to_pcm(str(tmp_path / "notes.pcm"), sample_rate=8001, sample_format="int24")
+    assert read(str(tmp_path / "notes.pcm")) == read(str(tmp_path / "notes.wav"))[44:-1]
+
+
+@pytest.mark.parametrize("memmap", [False, True])
+def test_empty_piece(tmp_path, memmap):
+    path = str(tmp_path / "empty.wav")
+    Note.array([]).to_wav(path, memmap=memmap)
+    assert len(read(path)) == 44
+    with wave.open(path, "rb") as file:
+        assert file.getnframes() == 0
+    Note.array.poly([]).to_pcm(str(tmp_path / "empty.pcm"), memmap=memmap)
+    assert read(str(tmp_path / "empty.pcm")) == b""
+
+
+def test_file_audio_pads_odd_data(tmp_path):
+    path = str(tmp_path / "session.wav")
+    audio = Note.FileAudio(path, "int24")
+    audio.play(np.zeros(3), 8000)
+    audio.wait()
+    assert len(read(path)) == 44 + 9 + 1
+    audio.play(np.zeros(1), 8000)
+    audio.close()
+    assert len(read(path)) == 44 + 12
+    with wave.open(path, "rb") as file:
+        assert file.getnframes() == 4
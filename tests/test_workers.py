@@ -0,0 +1,38 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+import bach
+from bach import Note
+
+
+def notes(seed, size):
+    rng = np.random.default_rng(seed)
+    return Note.array.bycolumns(rng.integers(40, 90, size), rng.choice([0.25, 0.5, 1], size), rng.choice([0, 0.3, 0.6], size),
+                                ([1], [1, 0.5, 0.2]), rng.integers(0, 2, size))
+
+
+def test_parallel_mix_is_the_serial_mix():
+    poly = Note.array.poly([notes(1, 30), notes(2, 40).transpose(2), notes(3, 10)])
+    serial = poly.wave(sample_rate=8000, workers=1, offsets=[0, 0.25, 3])
+    parallel = poly.wave(sample_rate=8000, workers=3, offsets=[0, 0.25, 3])
+    assert np.array_equal(parallel, serial)
+    assert np.array_equal(poly.wave(sample_rate=8000, workers=3, dtype=np.float32), poly.wave(sample_rate=8000, dtype=np.float32))
+
+
+def test_parallel_render_is_the_serial_render():
+    arrays = [notes(1, 20), Note.array([]), notes(2, 5)[::-1], 3*notes(3, 4), Note.array([Note("A4", dynamic=0)])]
+    waves = Note.array.render(arrays, sample_rate=8000, workers=3)
+    assert len(waves) == len(arrays)
+    for wave, array in zip(waves, arrays):
+        assert np.array_equal(wave, array.wave(sample_rate=8000))
+    assert waves[1].size == 0
+
+
+def test_workers_are_not_imported_with_the_module():
+    code = "import sys, bach; print('concurrent.futures' in sys.modules, 'multiprocessing.shared_memory' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(bach.__file__)))
+    assert result.stdout.split() == ["False", "False"]